@@ -0,0 +1,147 @@
+"""Tanıya bağlı deterministik tool yanıtları için kalıcı (SQLite) önbellek.
+
+`explain_diagnosis` ve `medical_researcher` yalnızca tanı metnine bağlıdır ve
+sınıflandırıcılar yalnızca dokuz etiket üretir. Yanıtlar tool adı + normalize tanı
+ile saklanır; istem metni veya model değişirse sürüm değişir ve eski yanıtlar
+kullanılmaz. ANSWER_CACHE_TTL_SECONDS'tan eski yanıtlar yeniden üretilir.
+
+Bilinen tüm etiketler için önceden doldurmak:
+    python -m app.agents.answer_cache warm
+    python -m app.agents.answer_cache stats
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.config import ANSWER_CACHE_PATH, ANSWER_CACHE_TTL_SECONDS
+from app.rag.retrieval_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_version(*parts):
+    """İstem şablonu ve model ayarlarından kısa bir sürüm özeti üretir"""
+    return hashlib.sha256("\x00".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Veritabanı dosyası içe aktarma sırasında değil, ilk get/put/stats çağrısında açılır"""
+
+    def __init__(self, path=ANSWER_CACHE_PATH, ttl_seconds=ANSWER_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _initialize(self):
+        with self._lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with sqlite3.connect(self.path, timeout=5) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS answers ("
+                    "tool TEXT NOT NULL, diagnosis TEXT NOT NULL, version TEXT NOT NULL, "
+                    "answer TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (tool, diagnosis))"
+                )
+            conn.close()
+            self._initialized = True
+
+    def _connection(self):
+        # SQLite bağlantıları thread'ler arasında paylaşılamadığından her thread kendi bağlantısını açar
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not self._initialized:
+                self._initialize()
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, tool, diagnosis, version):
+        """Güncel sürümde ve süresi dolmamış yanıt varsa döner"""
+        row = self._connection().execute(
+            "SELECT version, answer, created_at FROM answers WHERE tool = ? AND diagnosis = ?",
+            (tool, normalize_question(diagnosis))
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            stored_version, answer, created_at = row
+            if stored_version != version or time.time() - created_at > self.ttl_seconds:
+                self.stale += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return answer
+
+    def put(self, tool, diagnosis, version, answer):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (tool, diagnosis, version, answer, created_at) VALUES (?, ?, ?, ?, ?)",
+                (tool, normalize_question(diagnosis), version, answer, time.time())
+            )
+
+    def purge_expired(self):
+        """Süresi dolmuş yanıtları siler, silinen satır sayısını döner"""
+        with self._connection() as conn:
+            return conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+
+    def stats(self):
+        size = self._connection().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "path": self.path,
+                "ttl_seconds": self.ttl_seconds,
+                "size": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+answer_cache = AnswerCache()
+
+
+def known_diagnoses():
+    """Sınıflandırıcıların üretebildiği tüm etiketler"""
+    from app.inference.predict_diagnosis import CLASS_NAMES_LUNG, CLASS_NAMES_BRAIN
+
+    return CLASS_NAMES_LUNG + CLASS_NAMES_BRAIN
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tanı yanıtı önbelleğini yönetir")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("warm", help="Bilinen tüm etiketler için eksik veya eskimiş yanıtları üretir")
+    subparsers.add_parser("purge", help="Süresi dolmuş yanıtları siler")
+    subparsers.add_parser("stats", help="Önbellek istatistiklerini yazdırır")
+    args = parser.parse_args()
+
+    if args.command == "warm":
+        from app.agents.langchainagent import warm_answer_cache
+
+        print(json.dumps(warm_answer_cache(), indent=2, ensure_ascii=False))
+    elif args.command == "purge":
+        print(f"{answer_cache.purge_expired()} yanıt silindi")
+    else:
+        print(json.dumps(answer_cache.stats(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
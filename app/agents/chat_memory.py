@@ -0,0 +1,140 @@
+"""Sohbet (chat_id) başına token bütçeli konuşma hafızası.
+
+Her sohbetin son mesajları tahmini token bütçesi içinde aynen tutulur; bütçe aşılınca
+en eski mesajlar LLM ile kısa bir özete katlanır. Böylece her agent çağrısında
+gönderilen geçmiş sınırlı kalır. Bellekte en fazla CHAT_MEMORY_MAX_CHATS sohbet
+tutulur; en uzun süredir kullanılmayan ve CHAT_MEMORY_TTL_SECONDS'tan eski olanlar atılır.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.prompts import PromptTemplate
+
+from app.config import CHAT_MEMORY_MAX_CHATS, CHAT_MEMORY_MAX_TOKENS, CHAT_MEMORY_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Türkçe metinde Gemini token'ı ortalama 3-4 karaktere denk gelir; düşük tahmin bütçeyi güvenli tarafta tutar
+CHARS_PER_TOKEN = 3
+
+SUMMARY_PROMPT = PromptTemplate.from_template(
+    """Aşağıdaki tıbbi sohbetin mevcut özetini yeni satırlarla güncelle.
+Tanıları, hastanın sorduğu konuları ve verilen önemli bilgileri koru; kısa ve TÜRKÇE yaz.
+
+Mevcut özet:
+{summary}
+
+Yeni satırlar:
+{new_lines}
+
+Güncel özet:"""
+)
+
+
+def estimate_tokens(messages):
+    """Mesajların token sayısını yerel olarak tahmin eder (Gemini count_tokens ağ çağrısı yapar)"""
+    return sum(len(str(message.content)) for message in messages) // CHARS_PER_TOKEN
+
+
+class ChatMemory(ConversationSummaryBufferMemory):
+    """Bütçe aşılınca geçmişi bütçenin yarısına kadar özetleyen hafıza.
+
+    Özetleme her turda değil, tampon bütçenin yarısından tekrar dolduğunda yapılır.
+    """
+
+    def _pop_for_summary(self):
+        buffer = self.chat_memory.messages
+        if estimate_tokens(buffer) <= self.max_token_limit:
+            return []
+        pruned = []
+        while buffer and estimate_tokens(buffer) > self.max_token_limit // 2:
+            pruned.append(buffer.pop(0))
+        return pruned
+
+    def prune(self):
+        pruned = self._pop_for_summary()
+        if pruned:
+            self.moving_summary_buffer = self.predict_new_summary(pruned, self.moving_summary_buffer)
+
+    async def aprune(self):
+        pruned = self._pop_for_summary()
+        if pruned:
+            self.moving_summary_buffer = await self.apredict_new_summary(pruned, self.moving_summary_buffer)
+
+    def estimated_tokens(self):
+        return estimate_tokens(self.chat_memory.messages) + len(self.moving_summary_buffer) // CHARS_PER_TOKEN
+
+
+class ChatMemoryStore:
+    """chat_id -> ChatMemory eşlemesi; LRU kapasitesi ve hareketsizlik süresiyle sınırlı"""
+
+    def __init__(self, llm, max_chats=CHAT_MEMORY_MAX_CHATS, ttl_seconds=CHAT_MEMORY_TTL_SECONDS,
+                 max_token_limit=CHAT_MEMORY_MAX_TOKENS):
+        self.llm = llm
+        self.max_chats = max_chats
+        self.ttl_seconds = ttl_seconds
+        self.max_token_limit = max_token_limit
+        self._memories = OrderedDict()  # chat_id -> (ChatMemory, son kullanım)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _purge_expired(self, now):
+        while self._memories:
+            chat_id, (_, last_used) = next(iter(self._memories.items()))
+            if now - last_used <= self.ttl_seconds:
+                break
+            del self._memories[chat_id]
+            self.expired += 1
+
+    def get(self, chat_id):
+        """Sohbetin hafızasını döner, yoksa oluşturur"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._memories.get(chat_id)
+            if entry is None:
+                memory = ChatMemory(
+                    llm=self.llm,
+                    prompt=SUMMARY_PROMPT,
+                    max_token_limit=self.max_token_limit,
+                    memory_key="chat_history",
+                    return_messages=True,
+                    output_key="output"
+                )
+                self.created += 1
+            else:
+                memory = entry[0]
+            self._memories[chat_id] = (memory, now)
+            self._memories.move_to_end(chat_id)
+            while len(self._memories) > self.max_chats:
+                evicted_id, _ = self._memories.popitem(last=False)
+                self.evicted += 1
+                logger.info(f"Chat memory evicted: {evicted_id}")
+            return memory
+
+    def drop(self, chat_id):
+        with self._lock:
+            self._memories.pop(chat_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._memories.clear()
+
+    def stats(self):
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return {
+                "max_chats": self.max_chats,
+                "ttl_seconds": self.ttl_seconds,
+                "max_token_limit": self.max_token_limit,
+                "resident": len(self._memories),
+                "resident_tokens": sum(memory.estimated_tokens() for memory, _ in self._memories.values()),
+                "created": self.created,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
@@ -1,15 +1,21 @@
 from langchain.agents import create_openai_tools_agent, AgentExecutor
 from langchain.tools import tool
-from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from dotenv import load_dotenv
+import asyncio
+import functools
 import os
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
+import threading
+import time
 
 
-from app.rag.query_rag import ask_with_context_lung, ask_with_context_brain
+from app.agents.answer_cache import answer_cache, known_diagnoses, prompt_version
+from app.agents.chat_memory import ChatMemoryStore
+from app.agents.llm_clients import LLM_PROFILES, get_llm
+from app.config import AGENT_TOOL_TIMEOUT_SECONDS
+from app.rag.query_rag import aask_with_context_lung, aask_with_context_brain, aask_with_context_all
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,28 +26,14 @@ if not os.getenv("GOOGLE_API_KEY"):
     raise ValueError("GOOGLE_API_KEY environment variable not found")
 
 try:
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash-exp",
-        temperature=0.7,
-        max_output_tokens=1000,
-        timeout=30,
-        convert_system_message_to_human=True,
-
-    )
+    llm = get_llm("agent")
     logger.info("Gemini LLM successfully initialized")
 except Exception as e:
     logger.error(f"Gemini LLM initialization error: {e}")
     raise
 
 
-@tool
-def explain_diagnosis(diagnosis: str) -> str:
-    """Tanıya göre Türkçe tıbbi açıklama yapar (nedenler, belirtiler, tedaviler)."""
-    if not diagnosis.strip():
-        return "Geçerli bir tanı bilgisi sağlanmadı."
-
-    try:
-        prompt = f"""
+EXPLAIN_DIAGNOSIS_PROMPT = """
         Sen deneyimli bir doktorsun. Bir hastaya '{diagnosis}' teşhisi kondu.
         Bu hastalık hakkında hasta ve yakınlarının anlayabileceği şekilde açıklama yap:
 
@@ -55,21 +47,7 @@ def explain_diagnosis(diagnosis: str) -> str:
         Tıbbi terimler kullanırken açıklamalarını da ekle.
         """
 
-        response = llm.invoke([HumanMessage(content=prompt)])
-        return response.content
-    except Exception as e:
-        logger.error(f"Error in explain_diagnosis: {e}")
-        return "Tanı açıklaması sırasında bir hata oluştu."
-
-
-@tool
-def medical_researcher(diagnosis: str) -> str:
-    """Hastalığın tarihçesini ve güncel bilimsel bilgilerini TÜRKÇE olarak açıklar."""
-    if not diagnosis.strip():
-        return "Geçerli bir tanı bilgisi sağlanmadı."
-
-    try:
-        prompt = f"""
+MEDICAL_RESEARCHER_PROMPT = """
         Sen tıbbi literatürde uzman bir araştırmacısın. '{diagnosis}' hastalığı hakkında:
 
         1. Hastalığın tarihçesi ve keşfi
@@ -82,18 +60,160 @@ def medical_researcher(diagnosis: str) -> str:
         Bu bilgileri TÜRKÇE, bilimsel ama anlaşılır bir dille sun.
         """
 
-        response = llm.invoke([HumanMessage(content=prompt)])
-        return response.content
+# Yalnızca tanıya bağlı tool'lar; yanıtları kalıcı önbellekte tutulur
+DIAGNOSIS_PROMPTS = {
+    "explain_diagnosis": EXPLAIN_DIAGNOSIS_PROMPT,
+    "medical_researcher": MEDICAL_RESEARCHER_PROMPT,
+}
+
+
+async def cached_diagnosis_answer(tool_name, diagnosis):
+    """Tanı yanıtını önbellekten döner, yoksa LLM ile üretip önbelleğe yazar"""
+    template = DIAGNOSIS_PROMPTS[tool_name]
+    version = prompt_version(template, LLM_PROFILES["agent"])
+    answer = await asyncio.to_thread(answer_cache.get, tool_name, diagnosis, version)
+    if answer is None:
+        response = await llm.ainvoke([HumanMessage(content=template.format(diagnosis=diagnosis))])
+        answer = response.content
+        await asyncio.to_thread(answer_cache.put, tool_name, diagnosis, version, answer)
+    return answer
+
+
+async def awarm_answer_cache(diagnoses=None, workers=4):
+    """Bilinen tüm etiketler için eksik veya eskimiş tanı yanıtlarını çağıranın olay döngüsünde üretir"""
+    diagnoses = diagnoses or known_diagnoses()
+    tasks = [(tool_name, diagnosis) for diagnosis in diagnoses for tool_name in DIAGNOSIS_PROMPTS]
+    semaphore = asyncio.Semaphore(workers)
+
+    async def warm(tool_name, diagnosis):
+        async with semaphore:
+            return await cached_diagnosis_answer(tool_name, diagnosis)
+
+    results = await asyncio.gather(*(warm(*task) for task in tasks), return_exceptions=True)
+    failed = 0
+    for task, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logger.error(f"Answer cache warmup failed for {task}: {result}")
+    logger.info(f"Answer cache warmed: {len(tasks) - failed}/{len(tasks)} answers ready")
+    return {"answers": len(tasks), "failed": failed, **answer_cache.stats()}
+
+
+def warm_answer_cache(diagnoses=None, workers=4):
+    """Komut satırı için senkron sürüm; sunucu awarm_answer_cache'i kendi döngüsünde çalıştırır"""
+    return asyncio.run(awarm_answer_cache(diagnoses, workers))
+
+
+_tool_stats_lock = threading.Lock()
+_tool_stats = {}
+
+
+def _record_tool_call(name, elapsed, timed_out):
+    with _tool_stats_lock:
+        stats = _tool_stats.setdefault(name, {"calls": 0, "timeouts": 0, "total_seconds": 0.0})
+        stats["calls"] += 1
+        stats["timeouts"] += int(timed_out)
+        stats["total_seconds"] += elapsed
+
+
+def tool_stats():
+    """Tool başına çağrı, zaman aşımı ve ortalama süre"""
+    with _tool_stats_lock:
+        return {
+            "timeout_seconds": AGENT_TOOL_TIMEOUT_SECONDS,
+            "tools": {
+                name: {
+                    "calls": stats["calls"],
+                    "timeouts": stats["timeouts"],
+                    "avg_seconds": stats["total_seconds"] / stats["calls"],
+                }
+                for name, stats in _tool_stats.items()
+            },
+        }
+
+
+class ToolFailure(str):
+    """Yanıt üretemeyen tool'un çıktısı (geçersiz girdi veya hata); bu çıktıyla üretilen yanıt önbelleğe yazılmaz"""
+
+
+class ToolTimeout(ToolFailure):
+    """Süresi aşan tool'un çıktısı.
+
+    Metni agent'a yönelik bir nottur ve agent yolunda olduğu gibi modele gider;
+    tool'ları doğrudan çağıranlar (fast path) bu türü tanıyıp çıktıyı kullanıcıya göstermez.
+    """
+
+
+# AgentExecutor yineleme/süre sınırında yanıt yerine bu önekle başlayan sabit bir metin döner
+AGENT_STOPPED_PREFIX = "Agent stopped due to"
+
+
+def is_complete_answer(result):
+    """Agent sonucu sınıra takılmadan ve tüm tool'lar yanıt vererek üretildiyse True"""
+    if str(result.get("output", "")).startswith(AGENT_STOPPED_PREFIX):
+        return False
+    return not any(isinstance(observation, ToolFailure) for _, observation in result.get("intermediate_steps", ()))
+
+
+def with_timeout(func):
+    """Tool'u AGENT_TOOL_TIMEOUT_SECONDS ile sınırlar.
+
+    AgentExecutor aynı planlama adımındaki tool çağrılarını asyncio.gather ile
+    birlikte bekler; yavaş bir tool diğerlerinin sonuçlarını bekletmesin diye
+    süre aşımında hata yerine ToolTimeout döner ve agent elindeki kısmi sonuçlarla devam eder.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout=AGENT_TOOL_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            _record_tool_call(func.__name__, time.perf_counter() - start, timed_out=True)
+            logger.warning(f"Tool {func.__name__} timed out after {AGENT_TOOL_TIMEOUT_SECONDS:g}s")
+            return ToolTimeout(
+                f"{func.__name__} {AGENT_TOOL_TIMEOUT_SECONDS:g} saniye içinde yanıt veremedi. "
+                "Bu kaynak olmadan, diğer tool sonuçlarıyla yanıt ver."
+            )
+        _record_tool_call(func.__name__, time.perf_counter() - start, timed_out=False)
+        return result
+
+    return wrapper
+
+
+@tool
+@with_timeout
+async def explain_diagnosis(diagnosis: str) -> str:
+    """Tanıya göre Türkçe tıbbi açıklama yapar (nedenler, belirtiler, tedaviler)."""
+    if not diagnosis.strip():
+        return ToolFailure("Geçerli bir tanı bilgisi sağlanmadı.")
+
+    try:
+        return await cached_diagnosis_answer("explain_diagnosis", diagnosis)
+    except Exception as e:
+        logger.error(f"Error in explain_diagnosis: {e}")
+        return ToolFailure("Tanı açıklaması sırasında bir hata oluştu.")
+
+
+@tool
+@with_timeout
+async def medical_researcher(diagnosis: str) -> str:
+    """Hastalığın tarihçesini ve güncel bilimsel bilgilerini TÜRKÇE olarak açıklar."""
+    if not diagnosis.strip():
+        return ToolFailure("Geçerli bir tanı bilgisi sağlanmadı.")
+
+    try:
+        return await cached_diagnosis_answer("medical_researcher", diagnosis)
     except Exception as e:
         logger.error(f"Error in medical_researcher: {e}")
-        return "Araştırma bilgileri alınırken bir hata oluştu."
+        return ToolFailure("Araştırma bilgileri alınırken bir hata oluştu.")
 
 
 @tool
-def pulmonology_expert(question: str) -> str:
+@with_timeout
+async def pulmonology_expert(question: str) -> str:
     """Akciğer hastalıkları uzmanı olarak TÜRKÇE tıbbi soruları yanıtlar."""
     if not question.strip():
-        return "Geçerli bir soru sağlanmadı."
+        return ToolFailure("Geçerli bir soru sağlanmadı.")
 
     try:
         prompt = f"""
@@ -109,18 +229,19 @@ def pulmonology_expert(question: str) -> str:
         - Şüphe durumunda doktora başvurulması gerektiğini belirt
         """
 
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
         return response.content
     except Exception as e:
         logger.error(f"Error in pulmonology_expert: {e}")
-        return "Göğüs hastalıkları uzmanı yanıtı alınırken hata oluştu."
+        return ToolFailure("Göğüs hastalıkları uzmanı yanıtı alınırken hata oluştu.")
 
 
 @tool
-def neurology_expert(question: str) -> str:
+@with_timeout
+async def neurology_expert(question: str) -> str:
     """Nöroloji uzmanı olarak beyin ve sinir sistemi hastalıklarıyla ilgili TÜRKÇE soruları yanıtlar."""
     if not question.strip():
-        return "Geçerli bir soru sağlanmadı."
+        return ToolFailure("Geçerli bir soru sağlanmadı.")
 
     try:
         prompt = f"""
@@ -137,37 +258,53 @@ def neurology_expert(question: str) -> str:
         - Uzman hekime başvuru durumlarını açıkla
         """
 
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
         return response.content
     except Exception as e:
         logger.error(f"Error in neurology_expert: {e}")
-        return "Nöroloji uzmanı yanıtı alınırken hata oluştu."
+        return ToolFailure("Nöroloji uzmanı yanıtı alınırken hata oluştu.")
 
 
 @tool
-def lung_knowledge_base(question: str) -> str:
+@with_timeout
+async def lung_knowledge_base(question: str) -> str:
     """Akciğer hastalıkları bilgi tabanından TÜRKÇE yanıt verir."""
     if not question.strip():
-        return "Geçerli bir soru sağlanmadı."
+        return ToolFailure("Geçerli bir soru sağlanmadı.")
 
     try:
-        return ask_with_context_lung(question)
+        return await aask_with_context_lung(question)
     except Exception as e:
         logger.error(f"Error in lung_knowledge_base: {e}")
-        return "Akciğer hastalıkları bilgi tabanından yanıt alınırken hata oluştu."
+        return ToolFailure("Akciğer hastalıkları bilgi tabanından yanıt alınırken hata oluştu.")
 
 
 @tool
-def brain_knowledge_base(question: str) -> str:
+@with_timeout
+async def brain_knowledge_base(question: str) -> str:
     """Beyin hastalıkları bilgi tabanından TÜRKÇE yanıt verir."""
     if not question.strip():
-        return "Geçerli bir soru sağlanmadı."
+        return ToolFailure("Geçerli bir soru sağlanmadı.")
 
     try:
-        return ask_with_context_brain(question)
+        return await aask_with_context_brain(question)
     except Exception as e:
         logger.error(f"Error in brain_knowledge_base: {e}")
-        return "Beyin hastalıkları bilgi tabanından yanıt alınırken hata oluştu."
+        return ToolFailure("Beyin hastalıkları bilgi tabanından yanıt alınırken hata oluştu.")
+
+
+@tool
+@with_timeout
+async def medical_knowledge_base(question: str) -> str:
+    """Akciğer ve beyin hastalıkları bilgi tabanlarında birlikte arar, tek bir TÜRKÇE yanıt verir. Birden fazla organı ilgilendiren sorularda kullanılır."""
+    if not question.strip():
+        return ToolFailure("Geçerli bir soru sağlanmadı.")
+
+    try:
+        return await aask_with_context_all(question)
+    except Exception as e:
+        logger.error(f"Error in medical_knowledge_base: {e}")
+        return ToolFailure("Bilgi tabanlarından yanıt alınırken hata oluştu.")
 
 
 system_prompt = """
@@ -184,6 +321,8 @@ Sen deneyimli bir tıbbi AI asistanısın. Görevin hastalara ve yakınlarına t
 YAPISAL YAKLAŞIMIN:
 - Önce hastanın sorusunu tam olarak anla
 - Gerekirse uygun tool'ları kullan
+- Birbirinden bağımsız birden fazla tool gerekiyorsa hepsini aynı adımda birlikte çağır
+- Soru hem akciğer hem beyin hastalıklarını ilgilendiriyorsa iki bilgi tabanını ayrı ayrı çağırmak yerine medical_knowledge_base tool'unu kullan
 - Bilgileri hasta odaklı bir şekilde düzenle
 - Net ve yararlı yanıt ver
 
@@ -199,17 +338,13 @@ Hastalar seninle konuştuğunda kendilerini güvende hissetmeli.
 # === PROMPT TEMPLATE ===
 prompt_template = ChatPromptTemplate.from_messages([
     ("system", system_prompt),
-    MessagesPlaceholder("chat_history"),
+    MessagesPlaceholder("chat_history", optional=True),
     ("human", "{input}"),
     MessagesPlaceholder("agent_scratchpad")
 ])
 
-memory = ConversationBufferWindowMemory(
-    memory_key="chat_history",
-    return_messages=True,
-    k=10,
-    output_key="output"
-)
+# Her sohbetin kendi hafızası vardır; chat_id olmadan gelen sorular geçmişsiz yanıtlanır
+chat_memories = ChatMemoryStore(get_llm("summary"))
 
 tools = [
     explain_diagnosis,
@@ -217,7 +352,8 @@ tools = [
     pulmonology_expert,
     neurology_expert,
     lung_knowledge_base,
-    brain_knowledge_base
+    brain_knowledge_base,
+    medical_knowledge_base
 ]
 
 
@@ -233,11 +369,12 @@ def create_medical_agent():
         agent_executor = AgentExecutor(
             agent=agent,
             tools=tools,
-            memory=memory,
             verbose=True,
             handle_parsing_errors=True,
             max_iterations=5,
-            max_execution_time=60
+            max_execution_time=60,
+            # Başarısız tool çıktıları olan yanıtları ayırt etmek için (bkz. is_complete_answer)
+            return_intermediate_steps=True
         )
 
         logger.info("Medical AI Agent successfully created")
@@ -251,7 +388,14 @@ def create_medical_agent():
 agent_executor = create_medical_agent()
 
 
-def ask_medical_question(question: str, diagnosis: str = None) -> str:
+def agent_for_chat(chat_id=None):
+    """Sohbetin hafızasını kullanan agent kopyasını döner; chat_id yoksa paylaşılan geçmişsiz agent"""
+    if chat_id is None:
+        return agent_executor
+    return agent_executor.model_copy(update={"memory": chat_memories.get(chat_id)})
+
+
+def ask_medical_question(question: str, diagnosis: str = None, chat_id: str = None) -> str:
     """Tıbbi soru sorma fonksiyonu"""
     try:
         if diagnosis:
@@ -259,7 +403,7 @@ def ask_medical_question(question: str, diagnosis: str = None) -> str:
         else:
             full_question = question
 
-        response = agent_executor.invoke({"input": full_question})
+        response = asyncio.run(agent_for_chat(chat_id).ainvoke({"input": full_question}))
         return response.get("output", "Yanıt alınamadı.")
 
     except Exception as e:
@@ -267,11 +411,14 @@ def ask_medical_question(question: str, diagnosis: str = None) -> str:
         return "Üzgünüm, şu anda sorunuzu yanıtlayamıyorum. Lütfen daha sonra tekrar deneyin."
 
 
-def clear_conversation_history():
-    """Konuşma geçmişini temizler"""
+def clear_conversation_history(chat_id=None):
+    """Bir sohbetin (chat_id yoksa tüm sohbetlerin) konuşma geçmişini temizler"""
     try:
-        memory.clear()
-        logger.info("Conversation history cleared")
+        if chat_id is None:
+            chat_memories.clear()
+        else:
+            chat_memories.drop(chat_id)
+        logger.info(f"Conversation history cleared: {chat_id or 'all chats'}")
     except Exception as e:
         logger.error(f"Error clearing conversation history: {e}")
 
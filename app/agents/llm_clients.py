@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import threading
+import time
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.chains.question_answering import load_qa_chain
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import PrivateAttr
+
+from app.config import GEMINI_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+# Her profil tek bir uzun ömürlü istemciye karşılık gelir; istemci yeniden
+# kullanıldıkça alttaki HTTP/gRPC bağlantısı da açık kalır
+LLM_PROFILES = {
+    "agent": {
+        "model": GEMINI_MODEL_NAME,
+        "temperature": 0.7,
+        "max_output_tokens": 1000,
+        "timeout": 30,
+        "convert_system_message_to_human": True,
+    },
+    "rag": {
+        "model": GEMINI_MODEL_NAME,
+        "temperature": 0.3,
+        "timeout": 30,
+    },
+    "summary": {
+        "model": GEMINI_MODEL_NAME,
+        "temperature": 0.2,
+        "max_output_tokens": 400,
+        "timeout": 30,
+    },
+}
+
+
+class LoopLocalChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """Her olay döngüsü için ayrı async istemci kullanan Gemini istemcisi.
+
+    Üst sınıf async (gRPC) istemcisini ilk kullanıldığı döngüye bağlar; aynı istemci
+    `asyncio.run` ile açılıp kapanan ikinci bir döngüde "Event loop is closed" verir.
+    Kapanmış döngülerin istemcileri yeni istemci oluşturulurken bırakılır.
+    """
+
+    _loop_clients: dict = PrivateAttr(default_factory=dict)
+    _loop_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def async_client(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        with self._loop_lock:
+            client = self._loop_clients.get(loop)
+            if client is None:
+                for closed in [other for other in self._loop_clients if other.is_closed()]:
+                    del self._loop_clients[closed]
+                self.async_client_running = None
+                client = self._loop_clients[loop] = super().async_client
+            return client
+
+
+class LLMStatsHandler(BaseCallbackHandler):
+    """Bir profil için çağrı sayısı ve gecikmelerini toplar"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._started = {}
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def _finish(self, run_id, error=False):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency_ms": self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+                "max_latency_ms": self.max_seconds * 1000,
+            }
+
+
+_clients = {}
+_handlers = {}
+_chains = {}
+_lock = threading.Lock()
+
+
+def get_llm(profile="agent"):
+    """Profil için paylaşılan LLM istemcisini döner, ilk çağrıda oluşturur"""
+    llm = _clients.get(profile)
+    if llm is not None:
+        return llm
+    with _lock:
+        if profile not in _clients:
+            handler = LLMStatsHandler(profile)
+            _clients[profile] = LoopLocalChatGoogleGenerativeAI(callbacks=[handler], **LLM_PROFILES[profile])
+            _handlers[profile] = handler
+            logger.info(f"LLM client created for profile '{profile}'")
+        return _clients[profile]
+
+
+def get_qa_chain(profile="rag", chain_type="stuff"):
+    """Önceden kurulmuş soru-cevap zincirini döner"""
+    key = (profile, chain_type)
+    chain = _chains.get(key)
+    if chain is not None:
+        return chain
+    llm = get_llm(profile)
+    with _lock:
+        if key not in _chains:
+            _chains[key] = load_qa_chain(llm, chain_type=chain_type)
+        return _chains[key]
+
+
+def llm_stats():
+    return {profile: handler.stats() for profile, handler in _handlers.items()}
@@ -0,0 +1,169 @@
+"""Bilinen tanılar için agent planlamasını atlayan kural tabanlı yönlendirici.
+
+/predict'in ürettiği etiketlerden biriyle gelen sorularda organ tanıdan, niyet
+sorudaki anahtar kelimelerden belirlenir ve ilgili tool'lar doğrudan, paralel
+çağrılır. Agent'ın tool seçme ve sonuç sentezleme turları (iki LLM çağrısı) atlanır.
+Niyet belirsizse veya soru başka bir organa kayıyorsa None döner ve tam agent kullanılır.
+Süresi aşan tool'ların çıktıları yanıttan çıkarılır; hiçbiri yanıt vermezse kullanıcıya
+kısa bir mesaj döner ve sohbet hafızasına yazılmaz.
+"""
+import asyncio
+import logging
+import threading
+
+from app.agents.langchainagent import ToolFailure, ToolTimeout
+from app.inference.predict_diagnosis import CLASS_NAMES_LUNG, CLASS_NAMES_BRAIN
+from app.rag.retrieval_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Agent yolu: tool seçimi için bir planlama çağrısı + tool çıktılarını birleştiren sentez çağrısı
+AGENT_OVERHEAD_LLM_CALLS = 2
+
+ORGANS = {
+    "lung": {
+        "labels": CLASS_NAMES_LUNG,
+        "tools": ("pulmonology_expert", "lung_knowledge_base"),
+        "keywords": ("akciğer", "solunum", "nefes", "öksürük", "göğüs", "balgam", "pnömoni", "zatürre",
+                     "tüberküloz", "verem", "covid", "korona"),
+    },
+    "brain": {
+        "labels": CLASS_NAMES_BRAIN,
+        "tools": ("neurology_expert", "brain_knowledge_base"),
+        "keywords": ("beyin", "sinir", "nöroloji", "baş ağrısı", "glioma", "menenjiyom", "meningioma",
+                     "hipofiz", "nöbet", "felç", "migren"),
+    },
+}
+
+# Sağlıklı sonuçlarda açıklanacak bir hastalık yoktur; bu sorular agent'a bırakılır
+HEALTHY_LABELS = {"normal", "notumor"}
+
+TOOL_TIMEOUT_MESSAGE = "Kaynaklar şu anda zamanında yanıt veremedi. Lütfen biraz sonra tekrar deneyin."
+
+# "X nedir?" gibi genel kalıplar yalnızca başka bir niyet bulunmadığında açıklama sayılır
+GENERIC_EXPLAIN = ("nedir", "ne demek", "açıkla", "anlat")
+
+INTENTS = {
+    "explain": ("belirti", "semptom", "neden olur", "nedenleri"),
+    "research": ("tarihçe", "keşf", "araştırma", "epidemiyoloji", "istatistik", "sıklığı", "patofizyoloji",
+                 "prognoz", "güncel", "literatür"),
+    "clinical": ("tedavi", "ilaç", "ameliyat", "bulaş", "tehlikeli", "ne yapmalı", "nasıl geç", "iyileş",
+                 "risk", "önlem", "korun", "ciddi", "acil", "yaşam süresi"),
+}
+
+
+class Route:
+    def __init__(self, organ, intent, calls):
+        self.organ = organ
+        self.intent = intent
+        # (tool adı, tool girdisi) çiftleri
+        self.calls = calls
+
+    @property
+    def name(self):
+        return f"{self.organ}:{self.intent}"
+
+    def describe(self):
+        return {
+            "route": self.name,
+            "tools": [tool_name for tool_name, _ in self.calls],
+            "llm_calls_saved": AGENT_OVERHEAD_LLM_CALLS,
+        }
+
+
+def _mentions(text, keywords):
+    return any(keyword in text for keyword in keywords)
+
+
+class FastPathRouter:
+    def __init__(self, tools, enabled=True):
+        self.tools = tools
+        self.enabled = enabled
+        self._labels = {
+            normalize_question(label): (organ, label)
+            for organ, config in ORGANS.items() for label in config["labels"]
+        }
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.fallbacks = 0
+        self.llm_calls_saved = 0
+        self.by_route = {}
+
+    def route(self, diagnosis, question):
+        """Soru için doğrudan tool planı döner; belirsizse None"""
+        if not self.enabled:
+            return None
+        match = self._labels.get(normalize_question(diagnosis))
+        if match is None:
+            return None
+        organ, label = match
+        if normalize_question(label) in HEALTHY_LABELS:
+            return None
+
+        text = normalize_question(question)
+        other_organs = [name for name in ORGANS if name != organ]
+        if any(_mentions(text, ORGANS[name]["keywords"]) for name in other_organs):
+            return None
+
+        intents = [intent for intent, keywords in INTENTS.items() if _mentions(text, keywords)]
+        if not intents and _mentions(text, GENERIC_EXPLAIN):
+            intents = ["explain"]
+        if len(intents) != 1:
+            return None
+
+        intent = intents[0]
+        if intent == "explain":
+            calls = [("explain_diagnosis", label)]
+        elif intent == "research":
+            calls = [("medical_researcher", label)]
+        else:
+            expert, knowledge_base = ORGANS[organ]["tools"]
+            tool_question = f"Tanı: {label}. {question}"
+            calls = [(expert, tool_question), (knowledge_base, tool_question)]
+        return Route(organ, intent, calls)
+
+    async def run(self, route, memory=None, prompt=None):
+        """Rotadaki tool'ları paralel çalıştırır, çıktıları tek yanıtta birleştirir.
+
+        (yanıt, tam mı) döner; bir tool başarısız olduysa veya süresi aştıysa yanıt tam sayılmaz.
+        """
+        outputs = await asyncio.gather(*(
+            self.tools[tool_name].ainvoke(tool_input) for tool_name, tool_input in route.calls
+        ))
+        timed_out = [name for (name, _), output in zip(route.calls, outputs) if isinstance(output, ToolTimeout)]
+        answered = [output for output in outputs if not isinstance(output, ToolTimeout)]
+        if not answered:
+            answer = TOOL_TIMEOUT_MESSAGE
+        elif len(answered) == 1:
+            answer = answered[0]
+        else:
+            answer = f"{outputs[0]}\n\n**Bilgi tabanına göre:**\n{outputs[1]}"
+
+        # Sonraki sorular bağlamı kaybetmesin diye sohbetin hafızasına da yazılır
+        if answered and memory is not None and prompt is not None:
+            await memory.asave_context({"input": prompt}, {"output": answer})
+
+        with self._lock:
+            self.routed += 1
+            self.llm_calls_saved += AGENT_OVERHEAD_LLM_CALLS
+            self.by_route[route.name] = self.by_route.get(route.name, 0) + 1
+        logger.info(f"Fast path {route.name}: {len(route.calls)} tool(s), {AGENT_OVERHEAD_LLM_CALLS} LLM calls saved")
+        if timed_out:
+            logger.warning(f"Fast path {route.name}: dropped timed out tool(s) {timed_out}")
+        return answer, not any(isinstance(output, ToolFailure) for output in outputs)
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.routed + self.fallbacks
+            return {
+                "enabled": self.enabled,
+                "routed": self.routed,
+                "fallbacks": self.fallbacks,
+                "routed_ratio": self.routed / total if total else 0.0,
+                "llm_calls_saved": self.llm_calls_saved,
+                "by_route": dict(self.by_route),
+            }
@@ -0,0 +1,217 @@
+"""Birbirine çok benzeyen sorular için anlamsal yanıt önbelleği.
+
+"Tanı: soru" metni bilgi tabanlarıyla ortak embedding modeliyle vektörleştirilir ve
+normalize vektörler küçük bir FAISS iç çarpım (kosinüs) index'inde tutulur. Aynı
+kapsamda (endpoint + normalize tanı) benzerliği SEMANTIC_CACHE_THRESHOLD'u geçen
+önceki yanıt, agent çalıştırılmadan döner. Kayıtlar SEMANTIC_CACHE_TTL_SECONDS sonra
+geçersizleşir; kapasite dolunca en uzun süredir kullanılmayan kayıt atılır.
+
+Önbellek varsayılan olarak kapalıdır. Yanlış bir isabet başka bir sorunun tıbbi yanıtını
+döndüreceğinden, açmadan önce eşik kullanılan embedding modeliyle Türkçe soru çiftleri
+üzerinde ölçülmelidir:
+    python -m app.agents.semantic_cache calibrate [--pairs ek_ciftler.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS
+)
+from app.rag.retrieval_cache import normalize_question
+from app.rag.retriever_registry import get_embedder
+
+logger = logging.getLogger(__name__)
+
+# Eşiğin bu kadar altında kalan en iyi eşleşmeler eşik ayarı için ayrıca sayılır
+NEAR_MISS_MARGIN = 0.05
+
+
+class SemanticAnswerCache:
+    """Kapsam başına ayrı FAISS index'i; kapsamlar az (endpoint x tanı etiketi) olduğundan arama tam ve ucuzdur"""
+
+    def __init__(self, embedder_factory, capacity=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS, enabled=SEMANTIC_CACHE_ENABLED):
+        self.embedder_factory = embedder_factory
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._indexes = {}  # kapsam -> faiss.IndexIDMap2
+        self._entries = OrderedDict()  # id -> (kapsam, yanıt, kayıt zamanı)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def embed(self, question, diagnosis=None):
+        """Soruyu (varsa tanıyla) normalize edilmiş tek satırlık vektöre çevirir"""
+        text = f"{diagnosis}: {question}" if diagnosis else question
+        vector = np.asarray([self.embedder_factory().embed_query(text)], dtype="float32")
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, ids):
+        for entry_id in ids:
+            scope = self._entries.pop(entry_id)[0]
+            self._indexes[scope].remove_ids(np.asarray([entry_id], dtype="int64"))
+
+    def _purge_expired(self, now):
+        expired = [entry_id for entry_id, (_, _, created_at) in self._entries.items()
+                   if now - created_at > self.ttl_seconds]
+        if expired:
+            self._remove(expired)
+            self.expired += len(expired)
+
+    def get(self, scope, vector):
+        """Kapsamda eşiği geçen en benzer yanıtı (yanıt, benzerlik) olarak döner; yoksa None"""
+        with self._lock:
+            self._purge_expired(time.time())
+            index = self._indexes.get(scope)
+            if index is None or not index.ntotal:
+                self.misses += 1
+                return None
+
+            scores, ids = index.search(vector, 1)
+            score, entry_id = float(scores[0][0]), int(ids[0][0])
+            if score >= self.threshold:
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return self._entries[entry_id][1], score
+            self.misses += 1
+            if score >= self.threshold - NEAR_MISS_MARGIN:
+                self.near_misses += 1
+            return None
+
+    def put(self, scope, vector, answer):
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                index = self._indexes[scope] = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(vector, np.asarray([entry_id], dtype="int64"))
+            self._entries[entry_id] = (scope, answer, time.time())
+            overflow = len(self._entries) - self.capacity
+            if overflow > 0:
+                self._remove(list(self._entries)[:overflow])
+                self.evicted += overflow
+
+    async def alookup(self, endpoint, question, diagnosis=None):
+        """(önbellek yanıtı veya None, benzerlik, kayıt için vektör) döner; embedding hatası önbelleği atlar"""
+        if not self.enabled:
+            return None, None, None
+        try:
+            vector = await asyncio.to_thread(self.embed, question, diagnosis)
+        except Exception as e:
+            logger.error(f"Semantic cache embedding failed: {e}")
+            return None, None, None
+        hit = self.get(scope_key(endpoint, diagnosis), vector)
+        if hit is None:
+            return None, None, vector
+        return hit[0], hit[1], vector
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "near_misses": self.near_misses,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def scope_key(endpoint, diagnosis=None):
+    return endpoint, normalize_question(diagnosis) if diagnosis else ""
+
+
+semantic_cache = SemanticAnswerCache(get_embedder)
+
+
+# (tanı, soru, soru, aynı anlamda mı); aynı tanı kapsamında ayrılması gereken yakın sorular özellikle seçilmiştir
+CALIBRATION_PAIRS = [
+    ("Bacterial Pneumonia", "zatürre bulaşıcı mı", "zatürre başkalarına bulaşır mı", True),
+    ("Bacterial Pneumonia", "zatürre tedavisi nedir", "zatürre nasıl tedavi edilir", True),
+    ("glioma", "glioma belirtileri nelerdir", "glioma hangi belirtileri gösterir", True),
+    ("Tuberculosis", "tüberküloz ne kadar sürede iyileşir", "tüberkülozun iyileşmesi ne kadar sürer", True),
+    ("meningioma", "menenjiyom ameliyatı riskli mi", "menenjiyom ameliyatının riskleri var mı", True),
+    ("Corona Virus Disease", "covid akciğerde kalıcı hasar bırakır mı", "covid sonrası akciğer hasarı kalıcı olur mu", True),
+    ("pituitary", "hipofiz tümörü görmeyi etkiler mi", "hipofiz tümörü görme bozukluğu yapar mı", True),
+    ("Bacterial Pneumonia", "zatürre bulaşıcı mı", "zatürre tedavisi nedir", False),
+    ("Bacterial Pneumonia", "zatürre belirtileri nelerdir", "zatürre ölümcül mü", False),
+    ("glioma", "glioma ameliyatla tedavi edilir mi", "glioma kemoterapiyle tedavi edilir mi", False),
+    ("glioma", "glioma kalıtsal mı", "glioma bulaşıcı mı", False),
+    ("Tuberculosis", "tüberküloz aşısı var mı", "tüberküloz ilacı var mı", False),
+    ("meningioma", "menenjiyom iyi huylu mu", "menenjiyom kötü huylu mu", False),
+    ("Corona Virus Disease", "covid çocuklar için tehlikeli mi", "covid yaşlılar için tehlikeli mi", False),
+    ("pituitary", "hipofiz tümörü büyür mü", "hipofiz tümörü küçülür mü", False),
+]
+
+
+def calibrate(pairs=CALIBRATION_PAIRS, cache=semantic_cache, margin=0.01):
+    """Çiftlerin benzerliklerini ölçer ve hiçbir farklı anlamlı çifti eşleştirmeyen en düşük eşiği önerir"""
+    scored = []
+    for diagnosis, first, second, same in pairs:
+        similarity = float(np.dot(cache.embed(first, diagnosis)[0], cache.embed(second, diagnosis)[0]))
+        scored.append({"diagnosis": diagnosis, "first": first, "second": second, "same": same,
+                       "similarity": round(similarity, 4)})
+
+    different = [pair["similarity"] for pair in scored if not pair["same"]]
+    paraphrases = [pair["similarity"] for pair in scored if pair["same"]]
+    threshold = min(1.0, max(different, default=0.0) + margin)
+    return {
+        "recommended_threshold": round(threshold, 4),
+        "paraphrase_recall": sum(s >= threshold for s in paraphrases) / len(paraphrases) if paraphrases else 0.0,
+        "current_threshold": cache.threshold,
+        "false_hits_at_current": sum(s >= cache.threshold for s in different),
+        "pairs": scored,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anlamsal yanıt önbelleği araçları")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = subparsers.add_parser("calibrate", help="Eşiği Türkçe soru çiftleriyle ölçer")
+    calibrate_parser.add_argument(
+        "--pairs", help='Ek çiftler: her satırda {"diagnosis", "first", "second", "same"} içeren JSONL dosyası'
+    )
+    args = parser.parse_args()
+
+    pairs = list(CALIBRATION_PAIRS)
+    if args.pairs:
+        with open(args.pairs, encoding="utf-8") as f:
+            for line in filter(str.strip, f):
+                pair = json.loads(line)
+                pairs.append((pair["diagnosis"], pair["first"], pair["second"], bool(pair["same"])))
+    print(json.dumps(calibrate(pairs), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
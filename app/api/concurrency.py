@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi import HTTPException
+
+
+class ConcurrencyLimiter:
+    """Bir endpoint için eşzamanlı istek sınırı ve sınırlı bekleme kuyruğu.
+
+    En fazla `max_concurrent` istek aynı anda çalışır, en fazla `max_waiting` istek
+    sırada bekler. Kuyruk doluysa ya da bekleme `queue_timeout` saniyeyi aşarsa
+    istek 429 ile reddedilir; böylece yük altında gecikme sınırsız büyümez.
+    Sayaçlar yalnızca olay döngüsünden değiştirildiğinden kilit gerekmez.
+    """
+
+    def __init__(self, name, max_concurrent, max_waiting, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _reject(self, reason):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Sunucu şu anda yoğun ({reason}), lütfen biraz sonra tekrar deneyin",
+            headers={"Retry-After": str(max(1, int(self.queue_timeout)))}
+        )
+
+    async def acquire(self):
+        if not self._semaphore.locked():
+            # Boş yer varken acquire beklemeden döner; kontrol ile alma arasında başka istek araya giremez
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                self._reject("kuyruk dolu")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                self._reject("bekleme süresi aşıldı")
+            finally:
+                self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "queue_timeout_seconds": self.queue_timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
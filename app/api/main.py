@@ -1,19 +1,73 @@
-from fastapi import FastAPI, UploadFile, File, Form, APIRouter, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from app.api.startup import startup_phase, startup_report
+
+with startup_phase("import_web"):
+    from fastapi import FastAPI, UploadFile, File, Form, APIRouter, HTTPException, Header, Depends
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
+import asyncio
+import io
+import json
+import secrets
 import uuid
 import traceback
 import logging
-
-from app.api.schemas import SaveMessageRequest,AskRequest,JustAskRequest
-
-from app.inference.predict_diagnosis import (
-    predict_lung_from_bytes,
-    predict_brain_from_bytes,
-    load_model_lung,
-    load_model_brain
+import sys
+import zipfile
+
+from app.api.schemas import SaveMessageRequest,AskRequest,JustAskRequest,SwapModelRequest
+from app.api.concurrency import ConcurrencyLimiter
+
+from app.config import (
+    PREDICT_MAX_BATCH_SIZE,
+    PREDICT_MAX_WAIT_MS,
+    PREDICT_MAX_IN_FLIGHT,
+    PREDICT_BATCH_CHUNK_SIZE,
+    PREDICT_BATCH_MAX_FILES,
+    PREDICT_BATCH_MAX_TOTAL_MB,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_PATH,
+    INFERENCE_TORCH_THREADS,
+    LUNG_MODEL_ARTIFACT,
+    BRAIN_MODEL_ARTIFACT,
+    MODEL_MEMORY_BUDGET_MB,
+    MODEL_WARMUP,
+    MODEL_VERSIONS_FILE,
+    INFERENCE_ONLY,
+    AGENT_PRELOAD,
+    ADMIN_TOKEN,
+    RAG_WARMUP,
+    ANSWER_CACHE_WARMUP,
+    ASK_MAX_CONCURRENCY,
+    JUST_ASK_MAX_CONCURRENCY,
+    QA_MAX_QUEUE,
+    QA_QUEUE_TIMEOUT_SECONDS,
+    QA_FAST_PATH
 )
-from app.agents.langchainagent import agent_executor
+
+with startup_phase("import_inference"):
+    from app.inference.batching import MicroBatcher
+    from app.inference.executor import (
+        inference_executor,
+        run_in_inference_executor,
+        executor_stats,
+        shutdown_inference_executor
+    )
+    from app.inference.model_registry import ModelRegistry, ModelSpec
+    from app.inference.optimize_model import load_serving_model
+    from app.inference.prediction_cache import PredictionCache
+    from app.inference.predict_diagnosis import (
+        CLASS_NAMES_LUNG,
+        CLASS_NAMES_BRAIN,
+        LUNG_MODEL_PATH,
+        BRAIN_MODEL_PATH,
+        load_image_from_bytes,
+        preprocess_image_lung,
+        preprocess_image_brain,
+        predict_batch,
+        load_model_lung,
+        load_model_brain
+    )
 
 
 logging.basicConfig(level=logging.INFO)
@@ -36,24 +90,141 @@ app.add_middleware(
 )
 
 
-try:
-    models = {
-        "akciğer": load_model_lung(),
-        "beyin": load_model_brain()
-    }
-    logger.info("Modeller başarıyla yüklendi")
-except Exception as e:
-    logger.error(f"Model yükleme hatası: {e}")
-    models = {}
-
-predict_funcs = {
-    "akciğer": predict_lung_from_bytes,
-    "beyin": predict_brain_from_bytes
+# Modeller ilk kullanımda (veya MODEL_WARMUP ile başlangıçta) yüklenir
+model_registry = ModelRegistry(
+    memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    versions_file=MODEL_VERSIONS_FILE
+)
+model_registry.register(ModelSpec(
+    "akciğer",
+    load_model_lung,
+    LUNG_MODEL_PATH,
+    load_default=lambda: load_serving_model(
+        load_model_lung, LUNG_MODEL_PATH, LUNG_MODEL_ARTIFACT, INFERENCE_TORCH_THREADS
+    )
+))
+model_registry.register(ModelSpec(
+    "beyin",
+    load_model_brain,
+    BRAIN_MODEL_PATH,
+    load_default=lambda: load_serving_model(
+        load_model_brain, BRAIN_MODEL_PATH, BRAIN_MODEL_ARTIFACT, INFERENCE_TORCH_THREADS
+    )
+))
+
+preprocess_funcs = {
+    "akciğer": preprocess_image_lung,
+    "beyin": preprocess_image_brain
+}
+
+class_names = {
+    "akciğer": CLASS_NAMES_LUNG,
+    "beyin": CLASS_NAMES_BRAIN
 }
 
 
+prediction_cache = PredictionCache(capacity=PREDICTION_CACHE_SIZE, disk_path=PREDICTION_CACHE_PATH)
+
+
+def prepare_image(image_type, contents):
+    """Görüntüyü çözer ve modele hazır tensöre dönüştürür"""
+    return preprocess_funcs[image_type](load_image_from_bytes(contents))
+
+
+def make_forward(image_type):
+    """Bir modalite için toplu forward fonksiyonu oluşturur; her görüntü için (etiket, model sürümü) döner"""
+    def forward(image_tensors):
+        model, version = model_registry.get_versioned(image_type)
+        return [(label, version) for label in predict_batch(image_tensors, model, class_names[image_type])]
+    return forward
+
+
+batchers = {
+    image_type: MicroBatcher(
+        image_type,
+        make_forward(image_type),
+        max_batch_size=PREDICT_MAX_BATCH_SIZE,
+        max_wait_ms=PREDICT_MAX_WAIT_MS,
+        executor=inference_executor,
+        max_in_flight=PREDICT_MAX_IN_FLIGHT
+    )
+    for image_type in model_registry.names()
+}
+
+
+MB = 1024 * 1024
+MAX_IMAGE_BYTES = 10 * MB  # 10MB
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
 chat_data = {}  # {"chat_id": [{"question": "...", "response": "..."}]}
 
+# LangChain, Gemini istemcisi ve RAG yığını yalnızca ilk soru geldiğinde içe aktarılır
+_agent_for_chat = None
+
+
+def get_agent_executor(chat_id=None):
+    """Tıbbi agent'ı ilk kullanımda içe aktarır; chat_id verilirse o sohbetin hafızasıyla döner"""
+    global _agent_for_chat
+    if _agent_for_chat is None:
+        with startup_phase("import_agent"):
+            from app.agents.langchainagent import agent_for_chat
+        _agent_for_chat = agent_for_chat
+    return _agent_for_chat(chat_id)
+
+
+_fast_path_router = None
+
+
+def get_fast_path_router():
+    """Bilinen tanılar için agent'ı atlayan yönlendiriciyi döner (agent yüklendikten sonra çağrılmalı)"""
+    global _fast_path_router
+    if _fast_path_router is None:
+        from app.agents.langchainagent import tools
+        from app.agents.router import FastPathRouter
+        _fast_path_router = FastPathRouter({tool.name: tool for tool in tools}, enabled=QA_FAST_PATH)
+    return _fast_path_router
+
+
+def has_history(memory):
+    return memory is not None and bool(memory.chat_memory.messages or memory.moving_summary_buffer)
+
+
+async def lookup_semantic_cache(endpoint, agent_executor, question, diagnosis=None):
+    """Anlamsal önbelleğe bakar; (yanıt veya None, benzerlik, kayıt için vektör) döner.
+
+    Geçmişi olan sohbette üretilecek yanıt geçmişe dayanabileceğinden kayıt vektörü None döner.
+    """
+    history = has_history(agent_executor.memory)
+    if diagnosis is None and history:
+        # Sohbet geçmişine dayanan genel sorular ("peki tedavisi?") başka sohbetlere taşınmasın
+        return None, None, None
+    from app.agents.semantic_cache import semantic_cache
+    cached, similarity, vector = await semantic_cache.alookup(endpoint, question, diagnosis)
+    return cached, similarity, None if history else vector
+
+
+async def serve_cached_answer(agent_executor, prompt, answer):
+    """Önbellekten dönen yanıtı sohbet hafızasına da yazar"""
+    if agent_executor.memory is not None:
+        await agent_executor.memory.asave_context({"input": prompt}, {"output": answer})
+
+
+def agent_answer(result):
+    """Agent sonucundan (yanıt, tam mı) döner"""
+    from app.agents.langchainagent import is_complete_answer
+    if isinstance(result, dict) and "output" in result:
+        return result["output"], is_complete_answer(result)
+    return str(result), False
+
+
+def store_semantic_answer(endpoint, vector, answer, diagnosis=None, complete=True):
+    """Yalnızca tam yanıtları yazar; tool'u başarısız olan veya sınıra takılan yanıtlar tekrar denenmelidir"""
+    if vector is None or not complete:
+        return
+    from app.agents.semantic_cache import semantic_cache, scope_key
+    semantic_cache.put(scope_key(endpoint, diagnosis), vector, answer)
+
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -102,11 +273,99 @@ def delete_chat(chat_id: str):
         raise HTTPException(status_code=404, detail="Chat bulunamadı")
 
     del chat_data[chat_id]
+    if "app.agents.langchainagent" in sys.modules:
+        sys.modules["app.agents.langchainagent"].clear_conversation_history(chat_id)
     logger.info(f"Chat silindi: {chat_id}")
     return {"status": "success", "message": "Chat silindi"}
 
 
-app.include_router(router)
+if not INFERENCE_ONLY:
+    app.include_router(router)
+
+
+models_router = APIRouter(prefix="/models", tags=["Models"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Model yönetimi uçlarını ADMIN_TOKEN ile korur; token tanımlı değilse uçlar kapalıdır"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model yönetimi kapalı (ADMIN_TOKEN tanımlı değil)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Geçersiz yönetici anahtarı")
+
+
+@models_router.get("")
+def list_models():
+    """Model kayıt defterinin durumunu (yüklü modeller, bellek, sürümler) döner"""
+    return model_registry.stats()
+
+
+@models_router.post("/{image_type}/warmup", dependencies=[Depends(require_admin)])
+async def warmup_model(image_type: str):
+    """Modeli ilk istekten önce belleğe yükler"""
+    if image_type not in model_registry:
+        raise HTTPException(status_code=404, detail="Model bulunamadı")
+    version = await run_in_inference_executor(model_registry.version, image_type)
+    return {"status": "success", "version": version}
+
+
+@models_router.post("/{image_type}/swap", dependencies=[Depends(require_admin)])
+async def swap_model(image_type: str, request: SwapModelRequest):
+    """Modeli sunucuyu yeniden başlatmadan başka bir checkpoint sürümüne geçirir"""
+    if image_type not in model_registry:
+        raise HTTPException(status_code=404, detail="Model bulunamadı")
+    try:
+        await run_in_inference_executor(model_registry.swap, image_type, request.version)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model değiştirme hatası: {str(e)}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Model yüklenirken bir hata oluştu")
+    version = await run_in_inference_executor(model_registry.version, image_type)
+    return {"status": "success", "version": version}
+
+
+app.include_router(models_router)
+
+
+@app.on_event("startup")
+async def warmup_models():
+    loop = asyncio.get_running_loop()
+    if MODEL_WARMUP:
+        # Isınma arka planda yapılır, sunucu bu sırada istek kabul etmeye başlar
+        loop.run_in_executor(inference_executor, warmup_in_background, MODEL_WARMUP)
+    if not INFERENCE_ONLY and AGENT_PRELOAD:
+        loop.run_in_executor(None, preload_agent, loop)
+
+
+def warmup_in_background(names):
+    with startup_phase("model_warmup"):
+        model_registry.warmup(names)
+
+
+def preload_agent(loop):
+    try:
+        get_agent_executor()
+    except Exception as e:
+        logger.error(f"Agent yüklenemedi: {e}")
+        return
+    if RAG_WARMUP:
+        from app.rag.retriever_registry import knowledge_bases
+        with startup_phase("rag_warmup"):
+            knowledge_bases.warmup()
+    if ANSWER_CACHE_WARMUP:
+        from app.agents.langchainagent import awarm_answer_cache
+        # LLM istemcileri sunucu döngüsünde kullanılacağından ısınma da orada çalışır
+        with startup_phase("answer_cache_warmup"):
+            asyncio.run_coroutine_threadsafe(awarm_answer_cache(), loop).result()
+
+
+@app.on_event("shutdown")
+async def stop_batchers():
+    for batcher in batchers.values():
+        await batcher.stop()
+    shutdown_inference_executor()
 
 
 
@@ -118,24 +377,32 @@ async def predict_endpoint(file: UploadFile = File(...), image_type: str = Form(
             raise HTTPException(status_code=400, detail="Geçersiz dosya türü. Lütfen bir görüntü dosyası yükleyin.")
 
         contents = await file.read()
-        if len(contents) > 10 * 1024 * 1024:  # 10MB
+        if len(contents) > MAX_IMAGE_BYTES:
             raise HTTPException(status_code=400, detail="Dosya çok büyük. Maksimum 10MB.")
 
-        if image_type not in models:
-            available_types = list(models.keys())
+        if image_type not in model_registry:
+            available_types = model_registry.names()
             raise HTTPException(
                 status_code=400,
                 detail=f"Geçersiz görüntü türü. Desteklenen türler: {available_types}"
             )
 
 
-        model = models[image_type]
-        if model is None:
-            raise HTTPException(status_code=500, detail=f"{image_type} modeli yüklenemedi")
-
-
-        predict_fn = predict_funcs[image_type]
-        prediction = predict_fn(contents, model)
+        model_version = await run_in_inference_executor(model_registry.version, image_type)
+        cache_key, prediction = await asyncio.to_thread(
+            prediction_cache.lookup, contents, image_type, model_version
+        )
+        if prediction is None:
+            try:
+                image_tensor = await run_in_inference_executor(prepare_image, image_type, contents)
+            except Exception as e:
+                prediction = f"Hata oluştu: {str(e)}"
+            else:
+                prediction, used_version = await batchers[image_type].submit(image_tensor)
+                if used_version != model_version:
+                    # Arada model değiştiyse sonuç, tahmini gerçekten üreten sürümün anahtarına yazılır
+                    cache_key = prediction_cache.make_key(contents, image_type, used_version)
+                await asyncio.to_thread(prediction_cache.put, cache_key, prediction)
 
         logger.info(f"Tahmin yapıldı - Tür: {image_type}, Sonuç: {prediction}")
         return JSONResponse(content={
@@ -152,8 +419,163 @@ async def predict_endpoint(file: UploadFile = File(...), image_type: str = Form(
         raise HTTPException(status_code=500, detail="Tahmin işlemi sırasında bir hata oluştu")
 
 
+def too_many_images():
+    return HTTPException(
+        status_code=400,
+        detail=f"Çok fazla görüntü. Maksimum {PREDICT_BATCH_MAX_FILES} görüntü gönderilebilir."
+    )
+
+
+def extract_zip(filename, contents, max_files, max_total_bytes):
+    """Zip arşivindeki görüntüleri (dosya adı, içerik, hata) listesi olarak çıkarır.
+
+    Dosya sayısı ve açılmış toplam boyut, hiçbir girdi okunmadan önce merkezi dizinden
+    kontrol edilir; zipfile bir girdiden başlıkta yazan boyuttan fazlasını çıkarmaz.
+    """
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+        infos = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+        ]
+        if len(infos) > max_files:
+            raise too_many_images()
+        total_bytes = sum(
+            info.file_size for info in infos
+            if info.filename.lower().endswith(IMAGE_EXTENSIONS) and info.file_size <= MAX_IMAGE_BYTES
+        )
+        if total_bytes > max_total_bytes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arşiv çok büyük. Açılmış toplam boyut en fazla {PREDICT_BATCH_MAX_TOTAL_MB} MB olabilir."
+            )
+
+        for info in infos:
+            name = f"{filename}/{info.filename}"
+            if not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                entries.append((name, None, "Desteklenmeyen dosya türü"))
+            elif info.file_size > MAX_IMAGE_BYTES:
+                entries.append((name, None, "Dosya çok büyük. Maksimum 10MB."))
+            else:
+                entries.append((name, archive.read(info), None))
+    return entries
+
+
+def is_zip_upload(upload):
+    return upload.content_type in ("application/zip", "application/x-zip-compressed") or \
+        (upload.filename or "").lower().endswith(".zip")
+
+
+async def prepare_or_error(image_type, contents):
+    try:
+        return await run_in_inference_executor(prepare_image, image_type, contents), None
+    except Exception as e:
+        return None, f"Hata oluştu: {str(e)}"
+
+
+async def stream_batch_predictions(image_type, entries):
+    """Görüntüleri paralel çözer, gerçek tensör batch'leri halinde sınıflandırır ve NDJSON satırları üretir"""
+    # Tüm çözme işleri baştan kuyruğa alınır; böylece bir batch modelden geçerken
+    # sonraki batch'in görüntüleri çözülmeye devam eder
+    prepared = [
+        asyncio.ensure_future(prepare_or_error(image_type, contents)) if error is None else None
+        for _, contents, error in entries
+    ]
+    forward = make_forward(image_type)
+
+    try:
+        for start in range(0, len(entries), PREDICT_BATCH_CHUNK_SIZE):
+            chunk = list(range(start, min(start + PREDICT_BATCH_CHUNK_SIZE, len(entries))))
+            results = {}
+            tensors = {}
+            for index in chunk:
+                filename, _, error = entries[index]
+                if prepared[index] is not None:
+                    tensor, error = await prepared[index]
+                    if tensor is not None:
+                        tensors[index] = tensor
+                if error is not None:
+                    results[index] = {"filename": filename, "type": image_type, "error": error}
+
+            if tensors:
+                try:
+                    labels = await run_in_inference_executor(forward, list(tensors.values()))
+                    for index, (label, _) in zip(tensors, labels):
+                        results[index] = {"filename": entries[index][0], "type": image_type, "diagnosis": label}
+                except Exception as e:
+                    logger.error(f"Toplu tahmin hatası: {str(e)}")
+                    for index in tensors:
+                        results[index] = {
+                            "filename": entries[index][0],
+                            "type": image_type,
+                            "error": "Tahmin işlemi sırasında bir hata oluştu"
+                        }
+
+            for index in chunk:
+                yield json.dumps({"index": index, **results[index]}, ensure_ascii=False) + "\n"
+    finally:
+        for task in prepared:
+            if task is not None and not task.done():
+                task.cancel()
+
+
+@app.post("/predict/batch", tags=["Prediction"])
+async def predict_batch_endpoint(files: List[UploadFile] = File(...), image_type: str = Form(...)):
+    """Birden fazla görüntüyü (veya zip arşivini) toplu olarak analiz eder, sonuçları NDJSON olarak akıtır"""
+    if image_type not in model_registry:
+        available_types = model_registry.names()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Geçersiz görüntü türü. Desteklenen türler: {available_types}"
+        )
+
+    entries = []
+    total_bytes = 0
+    for upload in files:
+        contents = await upload.read()
+        if is_zip_upload(upload):
+            try:
+                extracted = await run_in_inference_executor(
+                    extract_zip,
+                    upload.filename,
+                    contents,
+                    PREDICT_BATCH_MAX_FILES - len(entries),
+                    PREDICT_BATCH_MAX_TOTAL_MB * MB - total_bytes
+                )
+                entries.extend(extracted)
+                total_bytes += sum(len(data) for _, data, _ in extracted if data is not None)
+            except zipfile.BadZipFile:
+                entries.append((upload.filename, None, "Geçersiz zip arşivi"))
+        elif not upload.content_type or not upload.content_type.startswith('image/'):
+            entries.append((upload.filename, None, "Geçersiz dosya türü"))
+        elif len(contents) > MAX_IMAGE_BYTES:
+            entries.append((upload.filename, None, "Dosya çok büyük. Maksimum 10MB."))
+        else:
+            entries.append((upload.filename, contents, None))
+            total_bytes += len(contents)
+
+        if len(entries) > PREDICT_BATCH_MAX_FILES:
+            raise too_many_images()
+
+    logger.info(f"Toplu tahmin başladı - Tür: {image_type}, Görüntü sayısı: {len(entries)}")
+    return StreamingResponse(
+        stream_batch_predictions(image_type, entries),
+        media_type="application/x-ndjson"
+    )
 
-@app.post("/ask", tags=["Q&A"])
+
+
+
+qa_router = APIRouter(tags=["Q&A"])
+
+# Akışlı uçlar da aynı sınırları paylaşır
+qa_limiters = {
+    "ask": ConcurrencyLimiter("ask", ASK_MAX_CONCURRENCY, QA_MAX_QUEUE, QA_QUEUE_TIMEOUT_SECONDS),
+    "just_ask": ConcurrencyLimiter("just_ask", JUST_ASK_MAX_CONCURRENCY, QA_MAX_QUEUE, QA_QUEUE_TIMEOUT_SECONDS),
+}
+
+
+@qa_router.post("/ask")
 async def ask_with_diagnosis(request: AskRequest):
     """Tanı bilgisi ile soru sorar"""
     try:
@@ -164,16 +586,34 @@ async def ask_with_diagnosis(request: AskRequest):
             raise HTTPException(status_code=400, detail="Tanı bilgisi boş olamaz")
 
         prompt = f"Yanıtlar Türkçe olarak verilecek. Tanı: {request.diagnosis}, Soru: {request.question}"
-        response = agent_executor.invoke({"input": prompt})
-
-
-        if isinstance(response, dict) and "output" in response:
-            response = response["output"]
-        else:
-            response = str(response)
-
-        logger.info(f"Tanı ile soru yanıtlandı - Tanı: {request.diagnosis[:50]}...")
-        return JSONResponse(content={"response": response})
+        agent_executor = await asyncio.to_thread(get_agent_executor, request.chat_id)
+        # Önbellek isabetleri eşzamanlılık sınırına takılmaz
+        cached, similarity, vector = await lookup_semantic_cache(
+            "ask", agent_executor, request.question, request.diagnosis
+        )
+        if cached is not None:
+            await serve_cached_answer(agent_executor, prompt, cached)
+            logger.info(f"Tanı ile soru önbellekten yanıtlandı (benzerlik {similarity:.3f})")
+            return JSONResponse(content={
+                "response": cached,
+                "routing": {"route": "semantic_cache", "similarity": round(similarity, 4)}
+            })
+
+        async with qa_limiters["ask"]:
+            fast_path = get_fast_path_router()
+            route = fast_path.route(request.diagnosis, request.question)
+            if route is not None:
+                response, complete = await fast_path.run(route, agent_executor.memory, prompt)
+                routing = route.describe()
+            else:
+                fast_path.record_fallback()
+                response, complete = agent_answer(await agent_executor.ainvoke({"input": prompt}))
+                routing = {"route": "agent", "llm_calls_saved": 0}
+
+        store_semantic_answer("ask", vector, response, request.diagnosis, complete)
+
+        logger.info(f"Tanı ile soru yanıtlandı ({routing['route']}) - Tanı: {request.diagnosis[:50]}...")
+        return JSONResponse(content={"response": response, "routing": routing})
 
     except HTTPException:
         raise
@@ -184,7 +624,7 @@ async def ask_with_diagnosis(request: AskRequest):
 
 
 
-@app.post("/just_ask", tags=["Q&A"])
+@qa_router.post("/just_ask")
 async def ask_without_diagnosis(request: JustAskRequest):
     """Tanı bilgisi olmadan soru sorar"""
     try:
@@ -192,16 +632,23 @@ async def ask_without_diagnosis(request: JustAskRequest):
             raise HTTPException(status_code=400, detail="Soru boş olamaz")
 
         prompt = f"Yanıtlar Türkçe olarak verilecek. Soru: {request.question}"
-        agent_response = agent_executor.invoke({"input": prompt})
+        agent_executor = await asyncio.to_thread(get_agent_executor, request.chat_id)
+        cached, similarity, vector = await lookup_semantic_cache("just_ask", agent_executor, request.question)
+        if cached is not None:
+            await serve_cached_answer(agent_executor, prompt, cached)
+            logger.info(f"Genel soru önbellekten yanıtlandı (benzerlik {similarity:.3f})")
+            return JSONResponse(content={
+                "response": cached,
+                "routing": {"route": "semantic_cache", "similarity": round(similarity, 4)}
+            })
 
+        async with qa_limiters["just_ask"]:
+            response, complete = agent_answer(await agent_executor.ainvoke({"input": prompt}))
 
-        if isinstance(agent_response, dict) and "output" in agent_response:
-            response = agent_response["output"]
-        else:
-            response = str(agent_response)
+        store_semantic_answer("just_ask", vector, response, complete=complete)
 
         logger.info("Genel soru yanıtlandı")
-        return JSONResponse(content={"response": response})
+        return JSONResponse(content={"response": response, "routing": {"route": "agent", "llm_calls_saved": 0}})
 
     except HTTPException:
         raise
@@ -212,12 +659,184 @@ async def ask_without_diagnosis(request: JustAskRequest):
 
 
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_agent_events(prompt, chat_id=None, diagnosis=None, question=None, cache_entry=None):
+    """Agent çalışırken tool olaylarını ve nihai yanıt token'larını SSE olarak akıtır.
+
+    Olaylar: `routing`, `tool_start`, `tool_end`, `token` (yanıt parçası), `final` (tam yanıt), `error`.
+    Tool'ların içindeki LLM çağrılarının token'ları akıtılmaz; yalnızca agent'ın kendi yanıtı gönderilir.
+    Tanı verilmişse önce hızlı yol denenir; bu durumda `token` olayı gönderilmez.
+    `cache_entry` (endpoint, vektör) verilirse nihai yanıt anlamsal önbelleğe yazılır.
+    """
+    endpoint, vector = cache_entry or (None, None)
+    active_tools = set()
+    try:
+        agent_executor = await asyncio.to_thread(get_agent_executor, chat_id)
+        if diagnosis is not None:
+            fast_path = get_fast_path_router()
+            route = fast_path.route(diagnosis, question)
+            if route is not None:
+                yield sse_event("routing", route.describe())
+                for tool_name, tool_input in route.calls:
+                    yield sse_event("tool_start", {"tool": tool_name, "input": tool_input})
+                response, complete = await fast_path.run(route, agent_executor.memory, prompt)
+                for tool_name, _ in route.calls:
+                    yield sse_event("tool_end", {"tool": tool_name})
+                store_semantic_answer(endpoint, vector, response, diagnosis, complete)
+                yield sse_event("final", {"response": response})
+                return
+            fast_path.record_fallback()
+            yield sse_event("routing", {"route": "agent", "llm_calls_saved": 0})
+
+        async for event in agent_executor.astream_events({"input": prompt}, version="v2"):
+            kind = event["event"]
+            if kind == "on_tool_start":
+                active_tools.add(event["run_id"])
+                yield sse_event("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                active_tools.discard(event["run_id"])
+                yield sse_event("tool_end", {"tool": event["name"]})
+            elif kind == "on_chat_model_stream" and not active_tools:
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    yield sse_event("token", {"text": content})
+            elif kind == "on_chain_end" and not event["parent_ids"]:
+                response, complete = agent_answer(event["data"].get("output"))
+                store_semantic_answer(endpoint, vector, response, diagnosis, complete)
+                yield sse_event("final", {"response": response})
+    except Exception as e:
+        logger.error(f"Akış sırasında soru-cevap hatası: {str(e)}")
+        traceback.print_exc()
+        yield sse_event("error", {"detail": "Soru yanıtlanırken bir hata oluştu"})
+
+
+async def stream_cached_answer(answer, similarity):
+    yield sse_event("routing", {"route": "semantic_cache", "similarity": round(similarity, 4)})
+    yield sse_event("final", {"response": answer})
+
+
+class LimitedStreamingResponse(StreamingResponse):
+    """Limiter yerini yanıt gönderimi nasıl biterse bitsin bırakır.
+
+    Üreteç hiç başlamadan istemci koparsa üretecin `finally` bloğu çalışmaz;
+    bu yüzden yerin sahibi üreteç değil yanıtın kendisidir.
+    """
+
+    def __init__(self, content, limiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+def sse_response(events, limiter=None):
+    """`limiter` verilirse çağıran tarafından alınmış yeri yanıt bitince bırakır"""
+    options = {"media_type": "text/event-stream", "headers": {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}}
+    if limiter is None:
+        return StreamingResponse(events, **options)
+    return LimitedStreamingResponse(events, limiter, **options)
+
+
+@qa_router.post("/ask/stream")
+async def ask_with_diagnosis_stream(request: AskRequest):
+    """Tanı bilgisi ile soru sorar, yanıtı SSE olarak akıtır"""
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Soru boş olamaz")
+
+    if not request.diagnosis.strip():
+        raise HTTPException(status_code=400, detail="Tanı bilgisi boş olamaz")
+
+    prompt = f"Yanıtlar Türkçe olarak verilecek. Tanı: {request.diagnosis}, Soru: {request.question}"
+    agent_executor = await asyncio.to_thread(get_agent_executor, request.chat_id)
+    cached, similarity, vector = await lookup_semantic_cache("ask", agent_executor, request.question, request.diagnosis)
+    if cached is not None:
+        await serve_cached_answer(agent_executor, prompt, cached)
+        logger.info(f"Tanı ile akışlı soru önbellekten yanıtlandı (benzerlik {similarity:.3f})")
+        return sse_response(stream_cached_answer(cached, similarity))
+
+    await qa_limiters["ask"].acquire()
+    logger.info(f"Tanı ile akışlı soru - Tanı: {request.diagnosis[:50]}...")
+    try:
+        events = stream_agent_events(prompt, request.chat_id, request.diagnosis, request.question, ("ask", vector))
+        return sse_response(events, qa_limiters["ask"])
+    except Exception:
+        qa_limiters["ask"].release()
+        raise
+
+
+@qa_router.post("/just_ask/stream")
+async def ask_without_diagnosis_stream(request: JustAskRequest):
+    """Tanı bilgisi olmadan soru sorar, yanıtı SSE olarak akıtır"""
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Soru boş olamaz")
+
+    prompt = f"Yanıtlar Türkçe olarak verilecek. Soru: {request.question}"
+    agent_executor = await asyncio.to_thread(get_agent_executor, request.chat_id)
+    cached, similarity, vector = await lookup_semantic_cache("just_ask", agent_executor, request.question)
+    if cached is not None:
+        await serve_cached_answer(agent_executor, prompt, cached)
+        logger.info(f"Akışlı genel soru önbellekten yanıtlandı (benzerlik {similarity:.3f})")
+        return sse_response(stream_cached_answer(cached, similarity))
+
+    await qa_limiters["just_ask"].acquire()
+    logger.info("Akışlı genel soru")
+    try:
+        events = stream_agent_events(prompt, request.chat_id, cache_entry=("just_ask", vector))
+        return sse_response(events, qa_limiters["just_ask"])
+    except Exception:
+        qa_limiters["just_ask"].release()
+        raise
+
+
+if not INFERENCE_ONLY:
+    app.include_router(qa_router)
+
+
 @app.get("/health", tags=["Health"])
 def health_check():
     """API'nin sağlık durumunu kontrol eder"""
     return {
         "status": "healthy",
-        "models_loaded": len(models),
-        "available_models": list(models.keys()),
+        "mode": "inference" if INFERENCE_ONLY else "full",
+        "models_loaded": sum(m["loaded"] for m in model_registry.stats()["models"].values()),
+        "available_models": model_registry.names(),
         "active_chats": len(chat_data)
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/metrics", tags=["Health"])
+def metrics():
+    """Başlangıç, tahmin kuyruğu, önbellek, model ve RAG performans metriklerini döner"""
+    report = {
+        "startup": startup_report(),
+        "executor": executor_stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "models": model_registry.stats(),
+        "batching": {image_type: batcher.stats() for image_type, batcher in batchers.items()}
+    }
+    if not INFERENCE_ONLY:
+        report["qa_concurrency"] = {name: limiter.stats() for name, limiter in qa_limiters.items()}
+    # RAG yığını yalnızca içe aktarıldıysa raporlanır; metrik isteği onu yüklememeli
+    if "app.rag.retriever_registry" in sys.modules:
+        report["rag"] = sys.modules["app.rag.retriever_registry"].knowledge_bases.stats()
+    if "app.rag.retrieval_cache" in sys.modules:
+        report["rag_cache"] = sys.modules["app.rag.retrieval_cache"].retrieval_cache.stats()
+    if "app.agents.llm_clients" in sys.modules:
+        report["llm"] = sys.modules["app.agents.llm_clients"].llm_stats()
+    if _fast_path_router is not None:
+        report["fast_path"] = _fast_path_router.stats()
+    if "app.agents.langchainagent" in sys.modules:
+        report["agent_tools"] = sys.modules["app.agents.langchainagent"].tool_stats()
+        report["chat_memory"] = sys.modules["app.agents.langchainagent"].chat_memories.stats()
+    if "app.agents.semantic_cache" in sys.modules:
+        report["semantic_cache"] = sys.modules["app.agents.semantic_cache"].semantic_cache.stats()
+    if "app.agents.answer_cache" in sys.modules:
+        report["answer_cache"] = sys.modules["app.agents.answer_cache"].answer_cache.stats()
+    return report
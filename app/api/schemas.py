@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class SaveMessageRequest(BaseModel):
@@ -9,7 +11,13 @@ class SaveMessageRequest(BaseModel):
 class AskRequest(BaseModel):
     diagnosis: str
     question: str
+    chat_id: Optional[str] = None
 
 
 class JustAskRequest(BaseModel):
     question: str
+    chat_id: Optional[str] = None
+
+
+class SwapModelRequest(BaseModel):
+    version: str = "default"
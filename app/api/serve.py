@@ -0,0 +1,150 @@
+"""Model ağırlıklarını worker'lar arasında paylaşan çok süreçli sunum.
+
+Örnek:
+    python -m app.api.serve --workers 4 --port 8000
+
+Ana süreç modelleri bir kez yükler, ağırlıkları paylaşımlı belleğe taşır, soketi
+açar ve ardından worker'ları fork eder. Böylece RSS worker sayısıyla doğrusal
+artmaz. Her worker'ın inference thread havuzu ve torch intra-op thread sayısı,
+worker x thread toplamı çekirdek sayısına eşit olacak şekilde ayarlanır.
+
+`/models/{tür}/swap` isteği yalnızca onu karşılayan worker'da çalışır; bu worker
+etkin sürümleri MODEL_VERSIONS_FILE'a yazar, diğer worker'lar dosyadaki değişikliği
+bir sonraki model erişiminde (en fazla ~1 sn gecikmeyle) kendileri uygular.
+
+Not: sohbet geçmişi (`/chat/*`) süreç belleğinde tutulduğundan çok worker'lı
+modda her worker'ın kendi sohbetleri olur; bu mod öncelikle `/predict` ölçeklemesi
+içindir.
+"""
+import argparse
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def plan_threads(workers, cores):
+    """Worker başına inference thread'i ve torch thread sayısını belirler.
+
+    app.config içe aktarılmadan önce ortam değişkenine yazılır; kullanıcı bu
+    değişkenleri açıkça verdiyse onlara dokunulmaz.
+    """
+    executor_workers = int(os.environ.setdefault("INFERENCE_MAX_WORKERS", "2"))
+    # app.config.INFERENCE_CONCURRENT_FORWARDS ile aynı hesap (iki modalite)
+    in_flight = int(os.environ.get("PREDICT_MAX_IN_FLIGHT", executor_workers))
+    concurrent_forwards = max(1, min(executor_workers, 2 * in_flight))
+    torch_threads = int(os.environ.setdefault(
+        "INFERENCE_TORCH_THREADS", str(max(1, cores // (workers * concurrent_forwards)))
+    ))
+    return executor_workers, torch_threads
+
+
+def run_worker(app, sock, index):
+    import uvicorn
+
+    # Ana sürecin sinyal işleyicileri uvicorn'unkilerle çakışmasın
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    logger.info(f"Worker {index} başladı (pid {os.getpid()})")
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paylaşımlı model ağırlıklarıyla çok worker'lı sunum")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", "2")))
+    parser.add_argument("--app", default="app.api.main:app", help="modül:değişken biçiminde ASGI uygulaması")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        raise SystemExit("Paylaşımlı ağırlıklı sunum fork gerektirir; bu platformda uvicorn --workers kullanın")
+
+    cores = os.cpu_count() or 1
+    executor_workers, torch_threads = plan_threads(args.workers, cores)
+    logger.info(
+        f"{args.workers} worker x {executor_workers} inference thread x {torch_threads} torch thread "
+        f"({cores} çekirdek)"
+    )
+
+    # app.config içe aktarılmadan önce ayarlanmalı; worker'lar swap'leri bu dosyadan öğrenir
+    owns_versions_file = "MODEL_VERSIONS_FILE" not in os.environ
+    versions_file = os.environ.setdefault(
+        "MODEL_VERSIONS_FILE", os.path.join(tempfile.gettempdir(), f"model_versions_{os.getpid()}.json")
+    )
+
+    module_name, app_name = args.app.split(":")
+    module = importlib.import_module(module_name)
+    app = getattr(module, app_name)
+
+    # Modeller fork'tan önce yüklenir; worker'lar aynı sayfaları salt okunur paylaşır
+    registry = getattr(module, "model_registry", None)
+    if registry is not None:
+        started = time.perf_counter()
+        registry.warmup()
+        registry.share_memory()
+        logger.info(f"Modeller fork öncesi {time.perf_counter() - started:.1f} sn içinde yüklendi")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    logger.info(f"Dinleniyor: http://{args.host}:{args.port}")
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, sock, index)
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(args.workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning(f"Worker {index} beklenmedik şekilde sonlandı (durum {status}), yeniden başlatılıyor")
+            time.sleep(1)
+            spawn(index)
+
+    sock.close()
+    if owns_versions_file and os.path.exists(versions_file):
+        os.remove(versions_file)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Soğuk başlangıç süresini aşamalara bölerek ölçer.
+
+Örnek:
+    python -m app.api.startup
+    INFERENCE_ONLY=1 python -m app.api.startup
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_started = time.perf_counter()
+_lock = threading.Lock()
+startup_phases = {}
+
+
+@contextmanager
+def startup_phase(name):
+    """Bir başlangıç aşamasının süresini kaydeder"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with _lock:
+            startup_phases[name] = elapsed_ms
+        logger.info(f"Başlangıç aşaması {name}: {elapsed_ms:.0f} ms")
+
+
+def startup_report():
+    with _lock:
+        return {
+            "phases_ms": {name: round(ms, 1) for name, ms in startup_phases.items()},
+            "since_first_import_ms": round((time.perf_counter() - _started) * 1000, 1),
+        }
+
+
+if __name__ == "__main__":
+    process_started = time.perf_counter()
+    import app.api.main  # noqa: F401
+    # `-m` ile çalıştırıldığında bu dosya __main__ olur; aşamalar app.api.startup modülüne kaydedilir
+    from app.api.startup import startup_report as recorded_report
+
+    report = recorded_report()
+    report["total_import_ms"] = round((time.perf_counter() - process_started) * 1000, 1)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
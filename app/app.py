@@ -76,6 +76,44 @@ def make_request(method, endpoint, **kwargs):
         return None
 
 
+def stream_answer(endpoint, data, placeholder, status):
+    """SSE yanıtını okur, token'ları geldikçe ekrana yazar; tam yanıtı döner"""
+    url = f"{BASE_URL}{endpoint}"
+    answer = ""
+    event = None
+    try:
+        with requests.post(url, json=data, stream=True, timeout=(10, 120)) as response:
+            if response.status_code != 200:
+                try:
+                    detail = response.json().get("detail", "")
+                except ValueError:
+                    detail = ""
+                raise RuntimeError(detail or f"HTTP {response.status_code}")
+
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    payload = json.loads(line[len("data:"):])
+                    if event == "tool_start":
+                        status.caption(f"🔧 {payload['tool']} çalışıyor...")
+                    elif event == "tool_end":
+                        status.caption(f"✅ {payload['tool']} tamamlandı")
+                    elif event == "token":
+                        answer += payload["text"]
+                        placeholder.markdown(f"**🤖 Asistan:** {answer}▌")
+                    elif event == "final":
+                        answer = payload["response"]
+                    elif event == "error":
+                        raise RuntimeError(payload.get("detail", ""))
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Bağlantı hatası: {str(e)}")
+
+    placeholder.markdown(f"**🤖 Asistan:** {answer}")
+    status.empty()
+    return answer
+
+
 def load_chat_list():
     """Chat listesini backend'den yükler"""
     response = make_request("GET", "/chat/list")
@@ -240,42 +278,40 @@ if clear_diagnosis:
     st.rerun()
 
 if submit_button and question.strip():
-    with st.spinner("🤔 Yanıt hazırlanıyor..."):
-        if st.session_state.diagnosis:
-            endpoint = "/ask"
-            data = {
-                "diagnosis": st.session_state.diagnosis,
-                "question": question
-            }
-        else:
-            endpoint = "/just_ask"
-            data = {"question": question}
-
-        response = make_request("POST", endpoint, json=data)
-
-        if response and response.status_code == 200:
-            answer = response.json()["response"]
-
-            if save_message(st.session_state.current_chat, question, answer):
-                st.session_state.chat_messages.append({
-                    "question": question,
-                    "response": answer
-                })
-                st.success("✅ Yanıt alındı!")
-                time.sleep(0.5)
-                st.rerun()
-            else:
-                st.error("Mesaj kaydedilemedi.")
+    if st.session_state.diagnosis:
+        endpoint = "/ask/stream"
+        data = {
+            "diagnosis": st.session_state.diagnosis,
+            "question": question,
+            "chat_id": st.session_state.current_chat
+        }
+    else:
+        endpoint = "/just_ask/stream"
+        data = {"question": question, "chat_id": st.session_state.current_chat}
+
+    status = st.empty()
+    status.caption("🤔 Yanıt hazırlanıyor...")
+    answer_placeholder = st.empty()
+
+    try:
+        answer = stream_answer(endpoint, data, answer_placeholder, status)
+    except RuntimeError as e:
+        status.empty()
+        error_msg = "Yanıt alınamadı."
+        if str(e):
+            error_msg += f" Hata: {e}"
+        st.error(error_msg)
+    else:
+        if save_message(st.session_state.current_chat, question, answer):
+            st.session_state.chat_messages.append({
+                "question": question,
+                "response": answer
+            })
+            st.success("✅ Yanıt alındı!")
+            time.sleep(0.5)
+            st.rerun()
         else:
-            error_msg = "Yanıt alınamadı."
-            if response:
-                try:
-                    error_detail = response.json().get("detail", "")
-                    if error_detail:
-                        error_msg += f" Hata: {error_detail}"
-                except:
-                    pass
-            st.error(error_msg)
+            st.error("Mesaj kaydedilemedi.")
 
 st.divider()
 st.subheader("📷 Görüntü Analizi")
@@ -8,4 +8,95 @@ ENVIRONMENT = os.getenv("ENVIRONMENT")
 if ENVIRONMENT == "PRODUCTION":
     BASE_URL = " "
 else:
-    BASE_URL = "http://127.0.0.1:8000"
\ No newline at end of file
+    BASE_URL = "http://127.0.0.1:8000"
+
+
+# === DEPLOYMENT ===
+# Yalnızca /predict ve /health sunulur; LangChain/RAG yığını hiç içe aktarılmaz
+INFERENCE_ONLY = os.getenv("INFERENCE_ONLY", "").lower() in ("1", "true", "yes")
+# Tam modda agent, ilk soruyu beklemeden başlangıçta arka planda yüklenir
+AGENT_PRELOAD = os.getenv("AGENT_PRELOAD", "1").lower() in ("1", "true", "yes")
+# /models/{tür}/warmup ve /swap uçları X-Admin-Token başlığıyla bu değeri ister; boşsa uçlar kapalıdır
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+# === INFERENCE ===
+INFERENCE_MAX_WORKERS = int(os.getenv("INFERENCE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "8"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+# Modalite başına aynı anda çalışan batch forward sayısı; varsayılan inference havuzunun tamamı
+PREDICT_MAX_IN_FLIGHT = int(os.getenv("PREDICT_MAX_IN_FLIGHT", str(INFERENCE_MAX_WORKERS)))
+# Aynı anda gerçekten çalışabilecek forward sayısı: havuz boyutu ve modaliteler (akciğer, beyin) x uçuştaki batch
+INFERENCE_MODALITIES = 2
+INFERENCE_CONCURRENT_FORWARDS = max(1, min(INFERENCE_MAX_WORKERS, INFERENCE_MODALITIES * PREDICT_MAX_IN_FLIGHT))
+# torch.set_num_threads süreç genelidir (thread'e özgü değildir); eşzamanlı forward'lar çekirdekleri paylaşır
+INFERENCE_TORCH_THREADS = int(
+    os.getenv("INFERENCE_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // INFERENCE_CONCURRENT_FORWARDS)))
+)
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", "16"))
+PREDICT_BATCH_MAX_FILES = int(os.getenv("PREDICT_BATCH_MAX_FILES", "500"))
+# Bir toplu istekte zip'lerden açılan ve doğrudan yüklenen görüntülerin toplam boyut sınırı
+PREDICT_BATCH_MAX_TOTAL_MB = int(os.getenv("PREDICT_BATCH_MAX_TOTAL_MB", "512"))
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH")  # boşsa yalnızca bellek katmanı kullanılır
+
+# Onaylı optimize model artifact'leri (bkz. app/inference/optimize_model.py); boşsa fp32 checkpoint kullanılır
+LUNG_MODEL_ARTIFACT = os.getenv("LUNG_MODEL_ARTIFACT")
+BRAIN_MODEL_ARTIFACT = os.getenv("BRAIN_MODEL_ARTIFACT")
+
+# 0 = sınırsız; aşılırsa en uzun süredir kullanılmayan model bellekten boşaltılır
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# Başlangıçta arka planda yüklenecek modeller, örn. "akciğer,beyin"
+MODEL_WARMUP = [name.strip() for name in os.getenv("MODEL_WARMUP", "").split(",") if name.strip()]
+# Çok süreçli sunumda /models/{tür}/swap bu dosya üzerinden tüm worker'lara yayılır (app.api.serve otomatik ayarlar)
+MODEL_VERSIONS_FILE = os.getenv("MODEL_VERSIONS_FILE")
+
+
+# === RAG ===
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# Onaylı ONNX embedding artifact klasörü (bkz. app/rag/embeddings.py); boşsa PyTorch fp32 SentenceTransformer kullanılır
+EMBEDDING_ARTIFACT = os.getenv("EMBEDDING_ARTIFACT")
+# ONNX Runtime iş parçacığı sayısı; görüntü inference havuzuyla CPU paylaşıldığından küçük tutulur
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "2"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Index dosyalarının değişip değişmediği en fazla bu aralıkla kontrol edilir
+RAG_RELOAD_CHECK_SECONDS = float(os.getenv("RAG_RELOAD_CHECK_SECONDS", "5"))
+RAG_WARMUP = os.getenv("RAG_WARMUP", "1").lower() in ("1", "true", "yes")
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "1024"))
+RAG_CACHE_TTL_SECONDS = float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+
+
+# === Q&A ===
+# Endpoint başına aynı anda çalışan agent sayısı ve bekleme kuyruğu; aşılırsa 429 döner
+QA_MAX_CONCURRENCY = int(os.getenv("QA_MAX_CONCURRENCY", "4"))
+ASK_MAX_CONCURRENCY = int(os.getenv("ASK_MAX_CONCURRENCY", str(QA_MAX_CONCURRENCY)))
+JUST_ASK_MAX_CONCURRENCY = int(os.getenv("JUST_ASK_MAX_CONCURRENCY", str(QA_MAX_CONCURRENCY)))
+QA_MAX_QUEUE = int(os.getenv("QA_MAX_QUEUE", "16"))
+QA_QUEUE_TIMEOUT_SECONDS = float(os.getenv("QA_QUEUE_TIMEOUT_SECONDS", "30"))
+# Bilinen tanılarla gelen net sorular agent planlaması olmadan doğrudan tool'lara yönlendirilir
+QA_FAST_PATH = os.getenv("QA_FAST_PATH", "1").lower() in ("1", "true", "yes")
+# Agent'ın aynı adımda paralel çalıştırdığı her tool için üst süre; aşan tool yerine zaman aşımı notu döner
+AGENT_TOOL_TIMEOUT_SECONDS = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "25"))
+# Sohbet başına hafıza: tahmini token bütçesi aşılınca eski turlar özetlenir (bkz. app/agents/chat_memory.py)
+CHAT_MEMORY_MAX_TOKENS = int(os.getenv("CHAT_MEMORY_MAX_TOKENS", "1500"))
+CHAT_MEMORY_MAX_CHATS = int(os.getenv("CHAT_MEMORY_MAX_CHATS", "256"))
+CHAT_MEMORY_TTL_SECONDS = float(os.getenv("CHAT_MEMORY_TTL_SECONDS", str(2 * 3600)))
+# Benzer soruların yanıtları için anlamsal önbellek (bkz. app/agents/semantic_cache.py); eşik kosinüs benzerliğidir.
+# Eşik embedding modeline göre `python -m app.agents.semantic_cache calibrate` ile ölçülmeden açılmamalıdır
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+
+# === LLM ===
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash-exp")
+# explain_diagnosis / medical_researcher yanıtlarının kalıcı önbelleği (bkz. app/agents/answer_cache.py)
+# Göreli yollar çalışma klasörüne değil depo köküne göre çözülür; dosya ilk kullanımda oluşturulur
+ANSWER_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    os.getenv("ANSWER_CACHE_PATH", ".cache/answer_cache.sqlite3")
+)
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Başlangıçta bilinen tüm etiketler için eksik yanıtlar arka planda üretilir (Gemini çağrısı yapar)
+ANSWER_CACHE_WARMUP = os.getenv("ANSWER_CACHE_WARMUP", "").lower() in ("1", "true", "yes")
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Bir modaliteye gelen önişlenmiş tensörleri kuyruğa alır ve toplu forward ile işler.
+
+    Kuyruktaki ilk eleman geldikten sonra batch, `max_batch_size` dolana ya da
+    `max_wait_ms` süresi bitene kadar doldurulur; sonuçlar her isteğin kendi
+    future'ına geri dağıtılır. Aynı anda en fazla `max_in_flight` batch'in forward'ı
+    çalışır; yer boşalana kadar gelen istekler kuyrukta birikip sonraki batch'i büyütür.
+    """
+
+    def __init__(self, name, forward_fn, max_batch_size=8, max_wait_ms=5, executor=None, max_in_flight=1):
+        self.name = name
+        self.forward_fn = forward_fn  # list[tensor] -> list[sonuç]
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+
+        self._queue = None
+        self._worker = None
+        self._pending_get = None
+        self._slots = None
+        self._forwards = set()
+
+        self.batch_size_histogram = Counter()
+        self.queue_depth_histogram = Counter()
+        self.total_batches = 0
+        self.total_items = 0
+        self.failed_batches = 0
+
+    def _ensure_started(self):
+        # Kuyruk ve worker, uvicorn'un event loop'u içinde ilk istekte oluşturulur
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        """Tek bir tensörü kuyruğa ekler ve batch sonucundaki kendi çıktısını bekler"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        self.queue_depth_histogram[self._queue.qsize()] += 1
+        return await future
+
+    async def _next(self, timeout=None):
+        # Zaman aşımında bekleyen get iptal edilmez, sonraki turda kullanılır;
+        # böylece kuyruktan alınmış bir eleman kaybolmaz
+        if self._pending_get is None:
+            self._pending_get = asyncio.ensure_future(self._queue.get())
+        done, _ = await asyncio.wait({self._pending_get}, timeout=timeout)
+        if not done:
+            return None
+        entry = self._pending_get.result()
+        self._pending_get = None
+        return entry
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._next()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            entry = await self._next(timeout=remaining)
+            if entry is None:
+                break
+            batch.append(entry)
+        return batch
+
+    async def _run(self):
+        while True:
+            # Yer alınmadan batch toplanmaz; böylece bekleyen istekler bir sonraki batch'te birleşir
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            self.batch_size_histogram[len(batch)] += 1
+            self.total_batches += 1
+            self.total_items += len(batch)
+
+            task = asyncio.create_task(self._forward(batch))
+            self._forwards.add(task)
+            task.add_done_callback(self._forwards.discard)
+
+    async def _forward(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.forward_fn, [item for item, _ in batch]
+            )
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"{self.name} batch forward hatası: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def stop(self):
+        """Worker görevini durdurur"""
+        for task in (self._worker, self._pending_get, *self._forwards):
+            if task is not None and not task.done():
+                task.cancel()
+        self._worker = None
+        self._pending_get = None
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self._forwards),
+            "total_batches": self.total_batches,
+            "total_items": self.total_items,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": self.total_items / self.total_batches if self.total_batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queue_depth_histogram": dict(sorted(self.queue_depth_histogram.items())),
+        }
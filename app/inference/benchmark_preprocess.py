@@ -0,0 +1,127 @@
+"""Eski torchvision önişleme yolu ile ortak hızlı önişleme hattını karşılaştırır.
+
+Örnek:
+    python -m app.inference.benchmark_preprocess data/xrays --limit 200
+    python -m app.inference.benchmark_preprocess --synthetic 2500x2000 --repeat 20
+"""
+import argparse
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+import torchvision.transforms as transforms
+from PIL import Image
+
+from app.inference.predict_diagnosis import (
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    image_to_tensor,
+    load_image_from_bytes
+)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def legacy_preprocess(image_bytes):
+    """Değişiklik öncesi yol: tam çözünürlükte çözme, RGB'ye dönüştürme, her çağrıda yeni Compose"""
+    transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+    ])
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return transform(image)
+
+
+def fast_preprocess(image_bytes):
+    return image_to_tensor(load_image_from_bytes(image_bytes))
+
+
+def synthetic_images(size, count=4):
+    """Verilen boyutta gri tonlamalı, röntgen benzeri JPEG'ler üretir"""
+    width, height = size
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:height, 0:width]
+    images = []
+    for _ in range(count):
+        base = 128 + 80 * np.sin(xx / rng.uniform(40, 120)) * np.cos(yy / rng.uniform(40, 120))
+        noise = rng.normal(0, 10, size=(height, width))
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, mode="L").save(buffer, format="JPEG", quality=90)
+        images.append(("synthetic", buffer.getvalue()))
+    return images
+
+
+def directory_images(root, limit):
+    images = []
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(directory, filename)
+                with open(path, "rb") as f:
+                    images.append((path, f.read()))
+                if len(images) >= limit:
+                    return images
+    return images
+
+
+def measure(fn, images, repeat):
+    timings = []
+    for _ in range(repeat):
+        for _, image_bytes in images:
+            started = time.perf_counter()
+            fn(image_bytes)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Önişleme hattı benchmark'ı")
+    parser.add_argument("root", nargs="?", help="Görüntü klasörü")
+    parser.add_argument("--synthetic", help="Sentetik görüntü boyutu, örn. 2500x2000")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        width, height = (int(v) for v in args.synthetic.lower().split("x"))
+        images = synthetic_images((width, height))
+    elif args.root:
+        images = directory_images(args.root, args.limit)
+    else:
+        parser.error("Bir görüntü klasörü veya --synthetic verilmelidir")
+
+    if not images:
+        raise SystemExit("Görüntü bulunamadı")
+
+    # Isınma
+    legacy_preprocess(images[0][1])
+    fast_preprocess(images[0][1])
+
+    legacy = measure(legacy_preprocess, images, args.repeat)
+    fast = measure(fast_preprocess, images, args.repeat)
+    max_diff = max(
+        float((legacy_preprocess(image_bytes) - fast_preprocess(image_bytes)).abs().max())
+        for _, image_bytes in images
+    )
+
+    print(f"Görüntü sayısı: {len(images)}, tekrar: {args.repeat}")
+    for name, result in (("eski", legacy), ("hızlı", fast)):
+        print(
+            f"{name:>6}: ort {result['mean_ms']:.2f} ms | p50 {result['p50_ms']:.2f} ms | "
+            f"p95 {result['p95_ms']:.2f} ms"
+        )
+    print(f"Hızlanma (ortalama): {legacy['mean_ms'] / fast['mean_ms']:.2f}x")
+    print(f"Maksimum mutlak fark (normalize uzayda): {max_diff:.4f}")
+
+
+if __name__ == "__main__":
+    main()
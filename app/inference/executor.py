@@ -0,0 +1,42 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from app.config import INFERENCE_CONCURRENT_FORWARDS, INFERENCE_MAX_WORKERS, INFERENCE_TORCH_THREADS
+
+logger = logging.getLogger(__name__)
+
+# Süreç genelinde bir kez ayarlanır: torch.set_num_threads hangi thread'den çağrılırsa çağrılsın
+# tüm süreci etkiler. Değer, aynı anda çalışabilecek forward sayısına göre seçilir (bkz. app.config).
+torch.set_num_threads(INFERENCE_TORCH_THREADS)
+
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_MAX_WORKERS,
+    thread_name_prefix="inference"
+)
+
+logger.info(
+    f"Inference executor hazır - worker: {INFERENCE_MAX_WORKERS}, "
+    f"eşzamanlı forward: {INFERENCE_CONCURRENT_FORWARDS}, torch thread: {INFERENCE_TORCH_THREADS}"
+)
+
+
+async def run_in_inference_executor(fn, *args):
+    """CPU-yoğun bir işi event loop'u bloklamadan inference thread havuzunda çalıştırır"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, fn, *args)
+
+
+def executor_stats():
+    return {
+        "max_workers": INFERENCE_MAX_WORKERS,
+        "concurrent_forwards": INFERENCE_CONCURRENT_FORWARDS,
+        "torch_threads": INFERENCE_TORCH_THREADS,
+        "queued_tasks": inference_executor._work_queue.qsize(),
+    }
+
+
+def shutdown_inference_executor():
+    inference_executor.shutdown(wait=False, cancel_futures=True)
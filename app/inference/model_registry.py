@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from app.inference.prediction_cache import checkpoint_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION = "default"
+MB = 1024 * 1024
+# Paylaşılan sürüm dosyası en fazla bu aralıkla kontrol edilir
+VERSIONS_CHECK_SECONDS = 1.0
+
+
+class ModelSpec:
+    """Bir modalitenin nasıl yükleneceğini tanımlar.
+
+    Varsayılan sürüm `default_path` checkpoint'idir (onaylı bir optimize artifact
+    varsa `load_default` onu kullanabilir ve gerçekten yüklediği dosyayı döner).
+    Ek sürümler `<checkpoint adı>/<sürüm>.pth` altında tutulur, örn.
+    app/model/lung_xray_model/v2.pth.
+    """
+
+    def __init__(self, name, load_checkpoint, default_path, load_default=None):
+        self.name = name
+        self.load_checkpoint = load_checkpoint  # path -> model
+        self.default_path = default_path
+        self.load_default = load_default or (lambda: (load_checkpoint(default_path), default_path))
+
+    @property
+    def versions_dir(self):
+        return os.path.splitext(self.default_path)[0]
+
+    def versions(self):
+        found = [DEFAULT_VERSION]
+        if os.path.isdir(self.versions_dir):
+            found += sorted(
+                os.path.splitext(name)[0] for name in os.listdir(self.versions_dir) if name.endswith(".pth")
+            )
+        return found
+
+    def path_for(self, version):
+        if os.path.basename(version) != version:
+            raise ValueError(f"Geçersiz model sürümü: {version}")
+        return os.path.join(self.versions_dir, f"{version}.pth")
+
+    def load(self, version):
+        """Sürümü yükler: (model, yüklenen dosya)"""
+        if version == DEFAULT_VERSION:
+            return self.load_default()
+        path = self.path_for(version)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{self.name} için {version} sürümü bulunamadı")
+        return self.load_checkpoint(path), path
+
+
+def model_memory_bytes(model, source_path=None):
+    """Parametre ve buffer'ların kapladığı belleği tahmin eder; ölçülemiyorsa dosya boyutunu kullanır"""
+    total = 0
+    if hasattr(model, "parameters"):
+        total += sum(p.numel() * p.element_size() for p in model.parameters())
+        total += sum(b.numel() * b.element_size() for b in model.buffers())
+    if total == 0 and source_path and os.path.exists(source_path):
+        # ONNX oturumları ve paketlenmiş INT8 ağırlıklar parametre olarak görünmez
+        total = os.path.getsize(source_path)
+    return total
+
+
+class _LoadedModel:
+    def __init__(self, model, version, memory_bytes, path):
+        self.model = model
+        self.version = version
+        self.memory_bytes = memory_bytes
+        self.path = path
+        # Tahmin önbelleği anahtarı; fp32'ye geri dönülmüşse artifact'e değil yüklenen checkpoint'e bağlıdır
+        self.cache_version = f"{version}:{checkpoint_version(path)}"
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+
+
+class ModelRegistry:
+    """Modelleri ilk kullanımda yükler, bellek bütçesi aşılınca en uzun süredir kullanılmayanı boşaltır.
+
+    `swap` yeni sürümü tamamen yükledikten sonra tek adımda yerine koyar; o an
+    çalışan forward'lar eski modelle tamamlanır. `versions_file` verilirse etkin
+    sürümler bu dosyaya yazılır ve dosyayı paylaşan diğer süreçler (çok worker'lı
+    sunum) değişikliği bir sonraki model erişiminde kendileri uygular.
+    """
+
+    def __init__(self, memory_budget_bytes=0, versions_file=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.versions_file = versions_file
+        self._versions_seen = None
+        self._versions_checked = 0.0
+        self._specs = {}
+        self._loaded = {}
+        self._active_versions = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+        self.loads = 0
+        self.evictions = 0
+
+    def register(self, spec):
+        self._specs[spec.name] = spec
+        self._active_versions[spec.name] = DEFAULT_VERSION
+        self._load_locks[spec.name] = threading.Lock()
+
+    def names(self):
+        return list(self._specs)
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def version(self, name):
+        """Tahmin önbelleği anahtarı için etkin modelin sürümünü döner (gerekirse modeli yükler)"""
+        return self._entry(name).cache_version
+
+    def get(self, name):
+        return self._entry(name).model
+
+    def get_versioned(self, name):
+        """Modeli ve önbellek sürümünü aynı kayıttan döner; araya giren bir swap ikisini ayıramaz"""
+        entry = self._entry(name)
+        return entry.model, entry.cache_version
+
+    def _entry(self, name):
+        self._sync_versions()
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                return entry
+
+        # Aynı model için eşzamanlı ilk istekler tek bir yüklemeyi bekler
+        with self._load_locks[name]:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    return entry
+            entry = self._load(name, self._active_versions[name])
+            self._install(name, entry)
+            return entry
+
+    def warmup(self, names=None):
+        for name in names or self.names():
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"{name} modeli ısıtılamadı: {e}")
+
+    def swap(self, name, version=DEFAULT_VERSION):
+        """Modeli sunucuyu yeniden başlatmadan yeni sürümle değiştirir"""
+        self._swap(name, version)
+        self._publish_versions()
+
+    def _swap(self, name, version, only_if_changed=False):
+        with self._load_locks[name]:
+            # Yayın uygulanırken araya yerel bir swap girip aynı sürüme geçirmiş olabilir
+            if only_if_changed and self._active_versions[name] == version:
+                return
+            entry = self._load(name, version)
+            self._active_versions[name] = version
+            self._install(name, entry)
+        logger.info(f"{name} modeli {version} sürümüne geçirildi")
+
+    def _publish_versions(self):
+        if not self.versions_file:
+            return
+        with self._lock:
+            tmp_path = f"{self.versions_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._active_versions, f, ensure_ascii=False)
+            os.replace(tmp_path, self.versions_file)
+            stat = os.stat(self.versions_file)
+            self._versions_seen = (stat.st_ino, stat.st_mtime_ns)
+
+    def _sync_versions(self):
+        """Başka bir sürecin yayınladığı sürüm değişikliklerini uygular.
+
+        Kontrol ve görülen sürümün güncellenmesi kilit altında yapılır; böylece aynı yayını
+        yalnızca bir thread uygular. Modeller kilit dışında yüklenir.
+        """
+        if not self.versions_file:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._versions_checked < VERSIONS_CHECK_SECONDS:
+                return
+            self._versions_checked = now
+            try:
+                stat = os.stat(self.versions_file)
+            except FileNotFoundError:
+                return
+            # Dosya her yayında os.replace ile yenilendiğinden inode, aynı zaman damgasındaki iki yayını da ayırır
+            seen = (stat.st_ino, stat.st_mtime_ns)
+            if seen == self._versions_seen:
+                return
+            self._versions_seen = seen
+            try:
+                with open(self.versions_file, encoding="utf-8") as f:
+                    published = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Model sürüm dosyası okunamadı: {e}")
+                return
+            changed = {
+                name: version for name, version in published.items()
+                if name in self._specs and version != self._active_versions[name]
+            }
+        for name, version in changed.items():
+            try:
+                self._swap(name, version, only_if_changed=True)
+            except Exception as e:
+                logger.error(f"{name} modeli yayınlanan {version} sürümüne geçirilemedi: {e}")
+
+    def share_memory(self):
+        """Yüklü modellerin tensörlerini paylaşımlı belleğe taşır; fork öncesinde çağrılır"""
+        with self._lock:
+            for name, entry in self._loaded.items():
+                if hasattr(entry.model, "share_memory"):
+                    entry.model.share_memory()
+                    logger.info(f"{name} modelinin ağırlıkları paylaşımlı belleğe taşındı")
+
+    def unload(self, name):
+        with self._lock:
+            self._loaded.pop(name, None)
+
+    def _load(self, name, version):
+        spec = self._specs[name]
+        started = time.perf_counter()
+        model, path = spec.load(version)
+        entry = _LoadedModel(model, version, model_memory_bytes(model, path), path)
+        self.loads += 1
+        logger.info(
+            f"{name} modeli yüklendi - sürüm: {version}, bellek: {entry.memory_bytes / MB:.1f} MB, "
+            f"süre: {time.perf_counter() - started:.2f} sn"
+        )
+        return entry
+
+    def _install(self, name, entry):
+        with self._lock:
+            self._loaded[name] = entry
+            self._evict_over_budget(keep=name)
+
+    def _evict_over_budget(self, keep):
+        if not self.memory_budget_bytes:
+            return
+        while sum(e.memory_bytes for e in self._loaded.values()) > self.memory_budget_bytes:
+            candidates = [(e.last_used, n) for n, e in self._loaded.items() if n != keep]
+            if not candidates:
+                logger.warning(f"{keep} modeli tek başına bellek bütçesini aşıyor")
+                return
+            _, victim = min(candidates)
+            del self._loaded[victim]
+            self.evictions += 1
+            logger.info(f"{victim} modeli bellek bütçesi nedeniyle boşaltıldı")
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            models = {}
+            for name, spec in self._specs.items():
+                entry = self._loaded.get(name)
+                models[name] = {
+                    "loaded": entry is not None,
+                    "active_version": self._active_versions[name],
+                    "available_versions": spec.versions(),
+                    "memory_mb": entry.memory_bytes / MB if entry else 0.0,
+                    "idle_seconds": now - entry.last_used if entry else None,
+                }
+            return {
+                "memory_budget_mb": self.memory_budget_bytes / MB,
+                "resident_memory_mb": sum(e.memory_bytes for e in self._loaded.values()) / MB,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": models,
+            }
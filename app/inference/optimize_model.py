@@ -0,0 +1,287 @@
+"""CPU sunumu için INT8 quantize edilmiş ve dışa aktarılmış (TorchScript / ONNX) modeller.
+
+Örnek:
+    # Artifact üret
+    python -m app.inference.optimize_model build --type akciğer --method static_int8 \\
+        --calibration data/xrays --output app/model/lung_int8.pt
+
+    # Orijinal modelle karşılaştır; eşik geçilirse artifact onaylanır
+    python -m app.inference.optimize_model compare --type akciğer \\
+        --artifact app/model/lung_int8.pt --samples data/xrays_val --min-agreement 0.99
+
+Onaylanan artifact, LUNG_MODEL_ARTIFACT / BRAIN_MODEL_ARTIFACT ile sunuma alınır.
+Karşılaştırma raporu (`<artifact>.parity.json`) olmayan, eşiği geçemeyen ya da
+karşılaştırıldığı fp32 checkpoint'i o zamandan beri değişmiş bir artifact yüklenmez;
+sunucu orijinal fp32 modele geri döner.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import time
+
+import torch
+import torch.nn as nn
+
+from app.inference.prediction_cache import checkpoint_version, file_digest
+from app.inference.predict_diagnosis import (
+    CLASS_NAMES_LUNG,
+    CLASS_NAMES_BRAIN,
+    LUNG_MODEL_PATH,
+    BRAIN_MODEL_PATH,
+    IMAGE_SIZE,
+    load_image,
+    image_to_tensor,
+    load_model_lung,
+    load_model_brain
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+METHODS = ("torchscript", "dynamic_int8", "static_int8", "onnx")
+
+MODALITIES = {
+    "akciğer": (load_model_lung, CLASS_NAMES_LUNG),
+    "beyin": (load_model_brain, CLASS_NAMES_BRAIN),
+}
+
+DEFAULT_CHECKPOINTS = {
+    "akciğer": LUNG_MODEL_PATH,
+    "beyin": BRAIN_MODEL_PATH,
+}
+
+
+class OnnxModel:
+    """ONNX Runtime oturumunu torch modeli gibi çağrılabilir hale getirir"""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        outputs = self.session.run(None, {self.input_name: batch.detach().cpu().numpy()})
+        return torch.from_numpy(outputs[0])
+
+    def eval(self):
+        return self
+
+
+def sample_batches(root, limit=256, batch_size=32):
+    """Klasördeki görüntülerden önişlenmiş (N, 3, 224, 224) batch'ler üretir"""
+    paths = []
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(directory, filename))
+    paths = sorted(paths)[:limit]
+    if not paths:
+        raise SystemExit(f"{root} içinde görüntü bulunamadı")
+
+    batches = []
+    for start in range(0, len(paths), batch_size):
+        tensors = [image_to_tensor(load_image(path)) for path in paths[start:start + batch_size]]
+        batches.append(torch.stack(tensors))
+    return batches
+
+
+def example_input(batch_size=1):
+    return torch.randn(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE)
+
+
+def quantize_dynamic_int8(model):
+    # Dinamik quantization yalnızca Linear katmanlarını kapsar; ResNet'te kazanç sınırlıdır
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_int8(model, calibration_batches):
+    """FX graph mode ile konvolüsyonlar dahil tüm modeli INT8'e çevirir"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    backend = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = backend
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), example_inputs=(example_input(),))
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def save_torchscript(model, output_path):
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, example_input(), check_trace=False)
+    scripted = torch.jit.freeze(scripted.eval())
+    torch.jit.save(scripted, output_path)
+
+
+def export_onnx(model, output_path):
+    torch.onnx.export(
+        model,
+        example_input(),
+        output_path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+        dynamo=False
+    )
+
+
+def build_artifact(image_type, method, output_path, model_path=None, calibration=None, calibration_limit=256):
+    load_model, _ = MODALITIES[image_type]
+    model = load_model(model_path) if model_path else load_model()
+    # Quantize edilmiş çekirdekler yalnızca CPU'da çalışır
+    model = copy.deepcopy(model).cpu().eval()
+
+    if method == "torchscript":
+        save_torchscript(model, output_path)
+    elif method == "dynamic_int8":
+        save_torchscript(quantize_dynamic_int8(model), output_path)
+    elif method == "static_int8":
+        if not calibration:
+            raise SystemExit("static_int8 için --calibration klasörü gereklidir")
+        save_torchscript(quantize_static_int8(model, sample_batches(calibration, calibration_limit)), output_path)
+    elif method == "onnx":
+        export_onnx(model, output_path)
+    else:
+        raise ValueError(f"Bilinmeyen yöntem: {method}")
+
+    logger.info(f"Optimize model kaydedildi: {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+
+def load_artifact(artifact_path, num_threads=None):
+    if artifact_path.endswith(".onnx"):
+        return OnnxModel(artifact_path, num_threads=num_threads)
+    model = torch.jit.load(artifact_path, map_location="cpu")
+    model.eval()
+    return model
+
+
+def _timed_forward(model, batches):
+    predictions = []
+    started = time.perf_counter()
+    with torch.no_grad():
+        for batch in batches:
+            predictions.extend(torch.argmax(model(batch), dim=1).tolist())
+    return predictions, time.perf_counter() - started
+
+
+def compare(image_type, artifact_path, samples, model_path=None, sample_limit=256, min_agreement=0.99):
+    """Optimize modeli orijinalle karşılaştırır ve sonucu `<artifact>.parity.json` olarak yazar"""
+    load_model, _ = MODALITIES[image_type]
+    reference_path = model_path or DEFAULT_CHECKPOINTS[image_type]
+    reference = load_model(reference_path).cpu().eval()
+    candidate = load_artifact(artifact_path)
+    batches = sample_batches(samples, sample_limit)
+
+    # Isınma turları; JIT ve ORT ilk çağrıda optimizasyon yapar
+    _timed_forward(reference, batches[:1])
+    _timed_forward(candidate, batches[:1])
+
+    reference_predictions, reference_seconds = _timed_forward(reference, batches)
+    candidate_predictions, candidate_seconds = _timed_forward(candidate, batches)
+
+    agreement = sum(
+        r == c for r, c in zip(reference_predictions, candidate_predictions)
+    ) / len(reference_predictions)
+    report = {
+        "image_type": image_type,
+        "artifact": os.path.basename(artifact_path),
+        "artifact_version": checkpoint_version(artifact_path),
+        "reference_checkpoint": os.path.basename(reference_path),
+        "reference_sha256": file_digest(reference_path),
+        "samples": len(reference_predictions),
+        "agreement": agreement,
+        "min_agreement": min_agreement,
+        "reference_images_per_sec": len(reference_predictions) / reference_seconds,
+        "optimized_images_per_sec": len(candidate_predictions) / candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds,
+        "approved": agreement >= min_agreement,
+    }
+    with open(artifact_path + ".parity.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def is_approved(artifact_path, reference_path):
+    """Artifact'in bu dosya sürümü ve bugünkü fp32 checkpoint için başarılı bir karşılaştırma raporu var mı"""
+    try:
+        with open(artifact_path + ".parity.json", encoding="utf-8") as f:
+            report = json.load(f)
+        reference_sha256 = file_digest(reference_path)
+    except (OSError, ValueError):
+        return False
+    return (
+        bool(report.get("approved"))
+        and report.get("artifact_version") == checkpoint_version(artifact_path)
+        and report.get("reference_sha256") == reference_sha256
+    )
+
+
+def load_serving_model(load_fp32, reference_path, artifact_path=None, num_threads=None):
+    """Onaylı bir optimize artifact varsa onu, yoksa orijinal fp32 modeli yükler: (model, yüklenen dosya)"""
+    if artifact_path:
+        if is_approved(artifact_path, reference_path):
+            logger.info(f"Optimize model yükleniyor: {artifact_path}")
+            return load_artifact(artifact_path, num_threads=num_threads), artifact_path
+        logger.warning(
+            f"{artifact_path} bu fp32 checkpoint için onaylı bir karşılaştırma raporuna sahip değil, "
+            "fp32 model kullanılacak"
+        )
+    return load_fp32(reference_path), reference_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize CPU modelleri üretir ve doğrular")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Optimize artifact üretir")
+    build_parser.add_argument("--type", dest="image_type", required=True, choices=list(MODALITIES))
+    build_parser.add_argument("--method", required=True, choices=METHODS)
+    build_parser.add_argument("--output", required=True)
+    build_parser.add_argument("--model-path", default=None)
+    build_parser.add_argument("--calibration", help="static_int8 kalibrasyonu için görüntü klasörü")
+    build_parser.add_argument("--calibration-limit", type=int, default=256)
+
+    compare_parser = subparsers.add_parser("compare", help="Artifact'i orijinal modelle karşılaştırır")
+    compare_parser.add_argument("--type", dest="image_type", required=True, choices=list(MODALITIES))
+    compare_parser.add_argument("--artifact", required=True)
+    compare_parser.add_argument("--samples", required=True, help="Örnek görüntü klasörü")
+    compare_parser.add_argument("--model-path", default=None)
+    compare_parser.add_argument("--sample-limit", type=int, default=256)
+    compare_parser.add_argument("--min-agreement", type=float, default=0.99)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_artifact(
+            args.image_type,
+            args.method,
+            args.output,
+            model_path=args.model_path,
+            calibration=args.calibration,
+            calibration_limit=args.calibration_limit
+        )
+    else:
+        report = compare(
+            args.image_type,
+            args.artifact,
+            args.samples,
+            model_path=args.model_path,
+            sample_limit=args.sample_limit,
+            min_agreement=args.min_agreement
+        )
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if not report["approved"]:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
+import numpy as np
 import torch
-import torchvision.transforms as transforms
 from PIL import Image
 from torchvision import models
 import io
@@ -10,6 +10,9 @@ device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 CLASS_NAMES_LUNG = ['Bacterial Pneumonia', 'Corona Virus Disease','Normal','Tuberculosis','Viral Pneumonia']
 CLASS_NAMES_BRAIN = ['glioma','meningioma','notumor','pituitary']
 
+LUNG_MODEL_PATH = "app/model/lung_xray_model.pth"
+BRAIN_MODEL_PATH = "app/model/brain_xray_model.pth"
+
 
 class ImprovedModel(nn.Module):
     def __init__(self, num_classes):
@@ -27,14 +30,14 @@ class ImprovedModel(nn.Module):
     def forward(self, x):
         return self.backbone(x)
 
-def load_model_lung(model_path="app/model/lung_xray_model.pth"):
+def load_model_lung(model_path=LUNG_MODEL_PATH):
     model = ImprovedModel(num_classes=len(CLASS_NAMES_LUNG))
     model.load_state_dict(torch.load(model_path, map_location=device))
     model.to(device)
     model.eval()
     return model
 
-def load_model_brain(model_path="app/model/brain_xray_model.pth"):
+def load_model_brain(model_path=BRAIN_MODEL_PATH):
     model = models.resnet18(pretrained=False)
     model.fc = torch.nn.Linear(model.fc.in_features, len(CLASS_NAMES_BRAIN))
     model.load_state_dict(torch.load(model_path, map_location=device))
@@ -42,38 +45,87 @@ def load_model_brain(model_path="app/model/brain_xray_model.pth"):
     model.eval()
     return model
 
-def preprocess_image_lung(image):
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                             std=[0.229, 0.224, 0.225])
-    ])
-    image = transform(image).unsqueeze(0)
-    return image.to(device)
+IMAGE_SIZE = 224
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# ToTensor + Normalize tek bir çarp-topla işlemine indirgenir:
+# (x / 255 - mean) / std = x * (1 / (255 * std)) + (-mean / std)
+_NORM_SCALE = (1.0 / (255.0 * torch.tensor(IMAGENET_STD))).view(3, 1, 1)
+_NORM_BIAS = (-torch.tensor(IMAGENET_MEAN) / torch.tensor(IMAGENET_STD)).view(3, 1, 1)
+
+
+def load_image(source):
+    """Görüntüyü açar; hedef boyuttan çok büyük JPEG'leri indirgenmiş çözünürlükte (draft) çözer.
+
+    Tek kanallı (L) röntgenler RGB'ye kopyalanmadan L olarak bırakılır.
+    """
+    image = Image.open(source)
+    if image.format == "JPEG" and min(image.size) >= 2 * IMAGE_SIZE:
+        # draft, JPEG'i DCT ölçeklemesiyle istenen boyuttan küçük olmayan en düşük çözünürlükte çözer
+        image.draft(image.mode, (IMAGE_SIZE, IMAGE_SIZE))
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    return image
+
+
+def load_image_from_bytes(image_bytes: bytes):
+    return load_image(io.BytesIO(image_bytes))
+
+
+def image_to_tensor(image):
+    """PIL görüntüsünü uint8 üzerinde yeniden boyutlandırıp tek adımda normalize eder, (3, 224, 224) CPU tensörü döner"""
+    if image.size != (IMAGE_SIZE, IMAGE_SIZE):
+        image = image.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR)
+    pixels = torch.from_numpy(np.array(image, dtype=np.uint8))
+    if pixels.ndim == 2:
+        # Gri görüntü bir kez normalize edilir, kanal parametreleri yayınlanarak 3 kanala açılır
+        pixels = pixels.unsqueeze(0)
+    else:
+        pixels = pixels.permute(2, 0, 1)
+    return torch.addcmul(_NORM_BIAS, pixels.float(), _NORM_SCALE)
+
+
+def preprocess_image(image):
+    return image_to_tensor(image).unsqueeze(0).to(device)
+
+
+# Her iki model de aynı ImageNet önişlemesiyle eğitildi
+preprocess_image_lung = preprocess_image
+preprocess_image_brain = preprocess_image
+
 
+def model_device(model):
+    """Modelin çalıştığı cihaz; optimize artifact'ler (ONNX, INT8/TorchScript) CPU için üretilir ve orada çalışır"""
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return torch.device("cpu")
+    # Quantize modellerin ağırlıkları paketlenmiş olduğundan parameters() boş dönebilir
+    return next(parameters(), torch.empty(0)).device
 
-def preprocess_image_brain(image):
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                             std=[0.229, 0.224, 0.225])
-    ])
-    # image = Image.open(image_path).convert("RGB")
-    image = transform(image).unsqueeze(0)
-    return image.to(device)
 
+def predict_batch(image_tensors, model, class_names):
+    """Önişlenmiş tensörleri tek bir forward ile sınıflandırır, her görüntü için etiket döner"""
+    batch = torch.cat(image_tensors).to(model_device(model))
+    with torch.no_grad():
+        outputs = model(batch)
+        predicted = torch.argmax(outputs, dim=1)
+    return [class_names[i] for i in predicted.tolist()]
 
 
+def predict_batch_probabilities(batch, model):
+    """(N, 3, 224, 224) batch için softmax olasılıklarını CPU tensörü olarak döner"""
+    with torch.no_grad():
+        outputs = model(batch.to(model_device(model)))
+        return torch.softmax(outputs, dim=1).cpu()
 
 
 def predict_lung_from_bytes(image_bytes:bytes,model):
     try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        image = load_image_from_bytes(image_bytes)
         image_tensor = preprocess_image_lung(image)
         with torch.no_grad():
-            outputs = model(image_tensor)
+            outputs = model(image_tensor.to(model_device(model)))
             predicted = torch.argmax(outputs,dim=1)
             return CLASS_NAMES_LUNG[predicted.item()]
 
@@ -82,10 +134,10 @@ def predict_lung_from_bytes(image_bytes:bytes,model):
 
 def predict_brain_from_bytes(image_bytes:bytes,model):
     try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        image = load_image_from_bytes(image_bytes)
         image_tensor = preprocess_image_brain(image)
         with torch.no_grad():
-            outputs = model(image_tensor)
+            outputs = model(image_tensor.to(model_device(model)))
             predicted = torch.argmax(outputs,dim=1)
             return CLASS_NAMES_BRAIN[predicted.item()]
 
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_version(model_path):
+    """Checkpoint dosyasının adı, boyutu ve değişiklik zamanından bir model sürümü üretir"""
+    try:
+        stat = os.stat(model_path)
+        return f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return os.path.basename(model_path)
+
+
+@lru_cache(maxsize=32)
+def _file_sha256(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    """Dosya içeriğinin SHA-256 özeti; dosya değişmedikçe yeniden hesaplanmaz"""
+    stat = os.stat(path)
+    return _file_sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class PredictionCache:
+    """Ham görüntü baytlarının özeti + görüntü türü + model sürümü ile anahtarlanan tahmin önbelleği.
+
+    Bellekte LRU katmanı tutulur; `disk_path` verilirse sonuçlar ayrıca SQLite
+    dosyasına yazılır ve yeniden başlatmalardan sonra da kullanılır.
+    """
+
+    def __init__(self, capacity=1024, disk_path=None):
+        self.capacity = capacity
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, diagnosis TEXT NOT NULL)"
+                )
+
+    def _connection(self):
+        # SQLite bağlantıları thread'ler arasında paylaşılamadığından her thread kendi bağlantısını açar
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(image_bytes, image_type, model_version):
+        digest = hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+        return f"{image_type}:{model_version}:{digest}"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+
+        if self.disk_path:
+            row = self._connection().execute(
+                "SELECT diagnosis FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, diagnosis):
+        self._remember(key, diagnosis)
+        if self.disk_path:
+            try:
+                with self._connection() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO predictions (key, diagnosis) VALUES (?, ?)", (key, diagnosis)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Tahmin önbelleği diske yazılamadı: {e}")
+
+    def _remember(self, key, diagnosis):
+        with self._lock:
+            self._entries[key] = diagnosis
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def lookup(self, image_bytes, image_type, model_version):
+        """Anahtarı hesaplar ve önbellekteki sonucu döner: (anahtar, tanı veya None)"""
+        key = self.make_key(image_bytes, image_type, model_version)
+        return key, self.get(key)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "capacity": self.capacity,
+                "size": len(self._entries),
+                "disk_enabled": bool(self.disk_path),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
@@ -0,0 +1,252 @@
+"""Bir klasör ağacındaki röntgen/MR görüntülerini toplu olarak skorlar.
+
+Örnek:
+    python -m app.inference.score_directory data/xrays --type akciğer --output scores.csv
+    python -m app.inference.score_directory data/mr --type beyin --output scores.parquet
+
+Çıktı dosyası aynı zamanda checkpoint'tir: tekrar çalıştırıldığında çıktıda zaten
+bulunan dosyalar (çözülemeyip hata satırı yazılanlar dahil) atlanır. Hatalı dosyaları
+yeniden denemek için --retry-errors verilir; eski hata satırları önce çıktıdan silinir.
+CSV çıktısına satır eklenir; Parquet çıktısı ise her batch için bir part dosyası
+içeren bir klasördür.
+"""
+import argparse
+import csv
+import logging
+import os
+import time
+
+import torch
+from torch.utils.data import Dataset, DataLoader
+
+from app.inference.predict_diagnosis import (
+    CLASS_NAMES_LUNG,
+    CLASS_NAMES_BRAIN,
+    load_image,
+    image_to_tensor,
+    load_model_lung,
+    load_model_brain,
+    predict_batch_probabilities
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+MODALITIES = {
+    "akciğer": (load_model_lung, CLASS_NAMES_LUNG),
+    "beyin": (load_model_brain, CLASS_NAMES_BRAIN),
+}
+
+
+class ImageDirectoryDataset(Dataset):
+    """Görüntüleri DataLoader worker'larında çözer ve önişler"""
+
+    def __init__(self, root, relative_paths):
+        self.root = root
+        self.relative_paths = relative_paths
+
+    def __len__(self):
+        return len(self.relative_paths)
+
+    def __getitem__(self, index):
+        relative_path = self.relative_paths[index]
+        try:
+            tensor = image_to_tensor(load_image(os.path.join(self.root, relative_path)))
+            return relative_path, tensor, None
+        except Exception as e:
+            return relative_path, None, str(e)
+
+
+def collate_images(items):
+    """Çözülemeyen görüntüleri batch dışında bırakır, hatalarını ayrıca taşır"""
+    ok = [(path, tensor) for path, tensor, error in items if error is None]
+    errors = [(path, error) for path, _, error in items if error is not None]
+    paths = [path for path, _ in ok]
+    batch = torch.stack([tensor for _, tensor in ok]) if ok else None
+    return paths, batch, errors
+
+
+def find_images(root):
+    paths = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.relpath(os.path.join(directory, filename), root))
+    return sorted(paths)
+
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+
+    def _rows(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    def recorded_paths(self):
+        """Çıktıda satırı bulunan (skorlanmış veya hatalı) yollar"""
+        return {row["path"] for row in self._rows()}
+
+    def drop_errors(self):
+        """Hata satırlarını çıktıdan siler; silinen satır sayısını döner"""
+        rows = self._rows()
+        kept = [row for row in rows if not row.get("error")]
+        if len(kept) == len(rows):
+            return 0
+        with open(self.path + ".tmp", "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            writer.writeheader()
+            writer.writerows(kept)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + ".tmp", self.path)
+        return len(rows) - len(kept)
+
+    def write(self, rows):
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            if is_new:
+                writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetWriter:
+    def __init__(self, path, columns):
+        try:
+            import pandas as pd
+            import pyarrow  # noqa: F401 - pandas'ın parquet motoru
+        except ImportError:
+            raise SystemExit("Parquet çıktısı için pandas ve pyarrow kurulu olmalıdır (pip install pandas pyarrow)")
+        self.pd = pd
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        self.part = len(self._parts())
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith(".parquet"))
+
+    def recorded_paths(self):
+        recorded = set()
+        for name in self._parts():
+            recorded.update(self.pd.read_parquet(os.path.join(self.path, name), columns=["path"])["path"])
+        return recorded
+
+    def drop_errors(self):
+        """Hata satırı içeren part dosyalarını bu satırlar olmadan yeniden yazar"""
+        dropped = 0
+        for name in self._parts():
+            part_path = os.path.join(self.path, name)
+            frame = self.pd.read_parquet(part_path)
+            failed = frame["error"].fillna("") != ""
+            if not failed.any():
+                continue
+            dropped += int(failed.sum())
+            if failed.all():
+                os.remove(part_path)
+                continue
+            frame[~failed].to_parquet(part_path + ".tmp", index=False)
+            os.replace(part_path + ".tmp", part_path)
+        return dropped
+
+    def write(self, rows):
+        frame = self.pd.DataFrame(rows, columns=self.columns)
+        final_path = os.path.join(self.path, f"part-{self.part:06d}.parquet")
+        # Yarım yazılmış part dosyası bir sonraki çalıştırmada okunmasın diye önce geçici isme yazılır
+        frame.to_parquet(final_path + ".tmp", index=False)
+        os.replace(final_path + ".tmp", final_path)
+        self.part += 1
+
+
+def make_writer(output, columns):
+    if output.lower().endswith(".parquet"):
+        return ParquetWriter(output, columns)
+    return CsvWriter(output, columns)
+
+
+def score_directory(root, image_type, output, model_path=None, batch_size=32, num_workers=4, retry_errors=False):
+    load_model, class_names = MODALITIES[image_type]
+    columns = ["path", "class"] + [f"score_{name}" for name in class_names] + ["error"]
+    writer = make_writer(output, columns)
+
+    all_paths = find_images(root)
+    if retry_errors:
+        dropped = writer.drop_errors()
+        if dropped:
+            logger.info(f"{dropped} hata satırı silindi, bu görüntüler yeniden denenecek")
+    recorded = writer.recorded_paths()
+    pending = [path for path in all_paths if path not in recorded]
+    logger.info(
+        f"{len(all_paths)} görüntü bulundu, {len(all_paths) - len(pending)} tanesi daha önce işlenmiş, "
+        f"{len(pending)} tanesi skorlanacak"
+    )
+    if not pending:
+        return
+
+    model = load_model(model_path) if model_path else load_model()
+    loader = DataLoader(
+        ImageDirectoryDataset(root, pending),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        collate_fn=collate_images,
+        pin_memory=torch.cuda.is_available()
+    )
+
+    started = time.perf_counter()
+    processed = 0
+    for step, (paths, batch, errors) in enumerate(loader, start=1):
+        rows = [{"path": path, "class": "", "error": error} for path, error in errors]
+        if batch is not None:
+            probabilities = predict_batch_probabilities(batch, model)
+            predicted = probabilities.argmax(dim=1).tolist()
+            for path, index, scores in zip(paths, predicted, probabilities.tolist()):
+                row = {"path": path, "class": class_names[index], "error": ""}
+                row.update({f"score_{name}": score for name, score in zip(class_names, scores)})
+                rows.append(row)
+
+        writer.write(rows)
+        processed += len(rows)
+
+        if step % 10 == 0:
+            elapsed = time.perf_counter() - started
+            logger.info(f"{processed}/{len(pending)} görüntü - {processed / elapsed:.1f} görüntü/sn")
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Tamamlandı: {processed} görüntü {elapsed:.1f} sn içinde skorlandı "
+        f"({processed / elapsed:.1f} görüntü/sn) -> {output}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Klasördeki tıbbi görüntüleri toplu olarak skorlar")
+    parser.add_argument("root", help="Görüntülerin bulunduğu klasör")
+    parser.add_argument("--type", dest="image_type", required=True, choices=list(MODALITIES))
+    parser.add_argument("--output", required=True, help=".csv dosyası veya .parquet klasörü")
+    parser.add_argument("--model-path", default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4, help="DataLoader worker sayısı")
+    parser.add_argument("--retry-errors", action="store_true", help="Daha önce çözülemeyen görüntüleri yeniden dene")
+    args = parser.parse_args()
+
+    score_directory(
+        args.root,
+        args.image_type,
+        args.output,
+        model_path=args.model_path,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        retry_errors=args.retry_errors
+    )
+
+
+if __name__ == "__main__":
+    main()
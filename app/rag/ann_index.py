@@ -0,0 +1,108 @@
+"""Bilgi tabanları için FAISS index türleri.
+
+    flat   Kesin (exact) arama, IndexFlatL2. Küçük korpuslar için varsayılan.
+    hnsw   Graf tabanlı yaklaşık arama (IndexHNSWFlat). Parametreler: M, efConstruction, efSearch
+    ivfpq  Ters dosya + ürün nicemleme (IndexIVFPQ). Parametreler: nlist, m, nbits, nprobe
+
+Arama zamanı parametreleri (efSearch, nprobe) index dosyasına yazılır; manifest'teki
+`search_params` ile yükleme sırasında değiştirilebilir.
+"""
+import logging
+import math
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {
+    "flat": {},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivfpq": {"nlist": 256, "m": 48, "nbits": 8, "nprobe": 16},
+}
+INDEX_TYPES = tuple(DEFAULT_PARAMS)
+SEARCH_PARAMS = ("efSearch", "nprobe")
+# k-means eğitimi için küme başına önerilen en az nokta sayısı
+MIN_POINTS_PER_CENTROID = 39
+
+
+def resolve_params(index_type, params=None):
+    if index_type not in DEFAULT_PARAMS:
+        raise ValueError(f"Bilinmeyen index türü: {index_type} (seçenekler: {', '.join(INDEX_TYPES)})")
+    unknown = set(params or {}) - set(DEFAULT_PARAMS[index_type])
+    if unknown:
+        raise ValueError(f"{index_type} için bilinmeyen parametre(ler): {sorted(unknown)}")
+    return {**DEFAULT_PARAMS[index_type], **(params or {})}
+
+
+def parse_index_spec(spec):
+    """"hnsw:M=16,efSearch=32" biçimindeki tanımı (tür, parametreler) olarak çözer"""
+    index_type, _, options = spec.partition(":")
+    params = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        params[key.strip()] = int(value)
+    return index_type.strip(), resolve_params(index_type.strip(), params)
+
+
+def describe(index_type, params):
+    options = ",".join(f"{key}={value}" for key, value in params.items())
+    return f"{index_type}:{options}" if options else index_type
+
+
+def effective_params(index, index_type, params):
+    """Oluşturulmuş index'in gerçekte kullandığı parametreleri döner (ivfpq küçük korpusta küçültülebilir)"""
+    params = resolve_params(index_type, params)
+    if index_type == "ivfpq":
+        ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+        return {**params, "nlist": ivf.nlist, "m": ivf.pq.M, "nbits": ivf.pq.nbits, "nprobe": ivf.nprobe}
+    if index_type == "hnsw":
+        return {**params, "efConstruction": index.hnsw.efConstruction, "efSearch": index.hnsw.efSearch}
+    return params
+
+
+def apply_search_params(index, params):
+    """efSearch / nprobe gibi arama zamanı parametrelerini yüklenmiş index'e uygular (nprobe en fazla nlist olur)"""
+    space = faiss.ParameterSpace()
+    for key, value in (params or {}).items():
+        if key not in SEARCH_PARAMS:
+            continue
+        if key == "nprobe":
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None and value > ivf.nlist:
+                logger.warning(f"nprobe {value} -> {ivf.nlist} (nlist) olarak küçültüldü")
+                value = ivf.nlist
+        space.set_index_parameter(index, key, value)
+
+
+def build_index(vectors, index_type="flat", params=None):
+    """Vektörlerden verilen türde, eğitilmiş ve doldurulmuş bir FAISS index'i oluşturur"""
+    params = resolve_params(index_type, params)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["efConstruction"]
+    else:
+        if dim % params["m"]:
+            raise ValueError(f"ivfpq: m={params['m']} boyutu ({dim}) tam bölmüyor")
+        # Küçük korpuslarda k-means eğitimi için yeterli nokta olmayabilir
+        trainable = max(1, count // MIN_POINTS_PER_CENTROID)
+        nlist = min(params["nlist"], trainable)
+        nbits = max(1, min(params["nbits"], int(math.log2(trainable))))
+        if (nlist, nbits) != (params["nlist"], params["nbits"]):
+            logger.warning(
+                f"ivfpq: {count} vektör için nlist {params['nlist']} -> {nlist}, "
+                f"nbits {params['nbits']} -> {nbits} olarak küçültüldü"
+            )
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, params["m"], nbits)
+        index.train(vectors)
+        # nlist'ten fazla küme taranamaz; küçültülen nlist ile nprobe de sınırlanır
+        params = {**params, "nprobe": min(params["nprobe"], nlist)}
+
+    index.add(vectors)
+    apply_search_params(index, params)
+    return index
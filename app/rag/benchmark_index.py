@@ -0,0 +1,120 @@
+"""Bilgi tabanı vektörleri üzerinde FAISS index türlerini karşılaştırır.
+
+Her index tanımı için kesin (flat) aramaya göre recall@k, tek sorgu gecikme
+yüzdelikleri ve vektör başına bellek raporlanır.
+
+Örnek:
+    python -m app.rag.benchmark_index --kb lung
+    python -m app.rag.benchmark_index --kb brain --k 2 --configs flat hnsw:M=16,efSearch=32 ivfpq:nlist=32,nprobe=8
+    python -m app.rag.benchmark_index --index app/rag/db --queries sorular.txt --json sonuc.json
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from app.rag.ann_index import build_index, describe, effective_params, parse_index_spec
+from app.rag.build_knowledge_base import EMBEDDING_CACHE_FILE
+from app.rag.docstore import INDEX_FILE, read_index_mmap
+from app.rag.retriever_registry import KNOWLEDGE_BASES
+
+DEFAULT_CONFIGS = ["flat", "hnsw", "hnsw:M=16,efSearch=32", "ivfpq", "ivfpq:nprobe=4"]
+
+
+def load_vectors(index_path):
+    """Index klasöründeki vektörleri embedding önbelleğinden ya da flat index'ten okur"""
+    cache_path = os.path.join(index_path, EMBEDDING_CACHE_FILE)
+    if os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            return np.ascontiguousarray(data["vectors"], dtype=np.float32)
+    index = read_index_mmap(os.path.join(index_path, INDEX_FILE))
+    if not isinstance(index, faiss.IndexFlat):
+        raise SystemExit(f"{index_path}: embedding önbelleği yok ve index flat değil, vektörler okunamıyor")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def make_queries(vectors, count, seed=0):
+    """Korpustan örneklenen vektörlere gürültü ekleyerek sorgu üretir"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    noise = rng.normal(0, vectors.std() * 0.5, size=sample.shape)
+    return np.ascontiguousarray(sample + noise, dtype=np.float32)
+
+
+def embed_queries(path):
+    from app.rag.retriever_registry import get_embedder
+
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    return np.asarray(get_embedder().embed_documents(questions), dtype=np.float32)
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def evaluate(index, queries, truth, k):
+    latencies = []
+    found = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += len(set(ids[0].tolist()) & set(expected.tolist()))
+    latencies.sort()
+    return {
+        "recall_at_k": found / (len(queries) * k),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "bytes_per_vector": len(faiss.serialize_index(index)) / index.ntotal,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index türleri için recall/gecikme/bellek benchmark'ı")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--kb", choices=sorted(KNOWLEDGE_BASES), help="Manifest'teki bilgi tabanı")
+    source.add_argument("--index", help="Index klasörü")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="Index tanımları, örn. hnsw:M=32,efSearch=64")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", help="Her satırda bir soru içeren dosya (verilmezse korpustan sentetik sorgu üretilir)")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS iş parçacığı sayısı")
+    parser.add_argument("--json", help="Sonuçları bu dosyaya JSON olarak yaz")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    vectors = load_vectors(KNOWLEDGE_BASES[args.kb] if args.kb else args.index)
+    queries = embed_queries(args.queries) if args.queries else make_queries(vectors, args.num_queries)
+    k = min(args.k, len(vectors))
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    print(f"{len(vectors)} vektör, boyut {vectors.shape[1]}, {len(queries)} sorgu, k={k}")
+    print(f"{'index':<40} {'kurulum sn':>10} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bayt/vektör':>12}")
+    results = []
+    for spec in args.configs:
+        index_type, params = parse_index_spec(spec)
+        started = time.perf_counter()
+        index = build_index(vectors, index_type, params)
+        build_seconds = time.perf_counter() - started
+        result = {"index": describe(index_type, effective_params(index, index_type, params)), "build_seconds": build_seconds, **evaluate(index, queries, truth, k)}
+        results.append(result)
+        print(
+            f"{result['index']:<40} {build_seconds:>10.2f} {result['recall_at_k']:>9.3f} {result['p50_ms']:>8.3f} "
+            f"{result['p95_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['bytes_per_vector']:>12.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "queries": len(queries), "k": k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
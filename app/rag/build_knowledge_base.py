@@ -0,0 +1,226 @@
+"""Manifest'teki tüm bilgi tabanları için FAISS index'lerini oluşturur.
+
+Örnek:
+    python -m app.rag.build_knowledge_base
+    python -m app.rag.build_knowledge_base --only brain --workers 8
+    python -m app.rag.build_knowledge_base --only lung --index-type hnsw:M=32,efSearch=64
+
+PDF sayfaları paralel süreçlerde çözülür, parçalar (chunk) büyük batch'ler halinde
+embed edilir. Her parçanın metin özeti index klasöründeki embedding önbelleğinde
+tutulur; bir PDF eklendiğinde veya değiştiğinde yalnızca yeni/değişen parçalar
+yeniden embed edilir. Yeni index geçici bir klasöre yazılıp tek adımda yerine
+konur, böylece sunucu hiçbir zaman yarım yazılmış bir index görmez. Dokümanlar
+pickle yerine mmap doküman deposuna (bkz. app/rag/docstore.py) yazılır.
+
+Index türü (flat, hnsw, ivfpq) manifest'teki `index_type` ve `index_params`
+alanlarıyla seçilir (bkz. app/rag/ann_index.py).
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from app.rag.ann_index import build_index, describe, effective_params, parse_index_spec, resolve_params
+from app.rag.docstore import save_mmap_store
+from app.rag.embeddings import embedder_id, make_embedder
+from app.rag.retriever_registry import MANIFEST_PATH, load_manifest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_FILE = "embedding_cache.npz"
+MIN_PAGES_PER_TASK = 8
+
+
+def resolve_pdfs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    return paths
+
+
+def extract_pages(pdf_path, start, stop):
+    """Bir PDF'in [start, stop) aralığındaki sayfalarını çözer (worker sürecinde çalışır)"""
+    reader = PdfReader(pdf_path)
+    labels = reader.page_labels
+    total_pages = len(reader.pages)
+    pages = []
+    for number in range(start, stop):
+        pages.append(Document(
+            page_content=reader.pages[number].extract_text() or "",
+            metadata={
+                "source": pdf_path,
+                "page": number,
+                "page_label": labels[number] if number < len(labels) else str(number + 1),
+                "total_pages": total_pages,
+            }
+        ))
+    return pages
+
+
+def load_pages(pdf_paths, workers):
+    """PDF'leri sayfa aralıklarına bölüp paralel süreçlerde çözer, sayfa sırasını korur"""
+    tasks = []
+    for pdf_path in pdf_paths:
+        total_pages = len(PdfReader(pdf_path).pages)
+        step = max(MIN_PAGES_PER_TASK, math.ceil(total_pages / workers))
+        tasks.extend((pdf_path, start, min(start + step, total_pages)) for start in range(0, total_pages, step))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extract_pages, *task) for task in tasks]
+        return [page for future in futures for page in future.result()]
+
+
+def split_pages(pages, chunk_size, chunk_overlap):
+    splitter = CharacterTextSplitter(
+        separator="\n",
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+    return splitter.split_documents(pages)
+
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_embedding_cache(index_path, model_name):
+    """Önceki build'de hesaplanan parça vektörlerini {özet: vektör} olarak döner"""
+    path = os.path.join(index_path, EMBEDDING_CACHE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as data:
+        if str(data["model"]) != model_name:
+            logger.info(f"{path} farklı bir embedding modeline ait, yok sayılıyor")
+            return {}
+        return dict(zip(data["fingerprints"].tolist(), data["vectors"]))
+
+
+def save_embedding_cache(index_path, model_name, fingerprints, vectors):
+    np.savez(
+        os.path.join(index_path, EMBEDDING_CACHE_FILE),
+        model=np.array(model_name),
+        fingerprints=np.array(fingerprints),
+        vectors=vectors
+    )
+
+
+def embed_chunks(chunks, cache, embedder, batch_size):
+    """Önbellekte olmayan parçaları batch'ler halinde embed eder; (özetler, vektörler, yeni parça sayısı) döner"""
+    fingerprints = [fingerprint(chunk.page_content) for chunk in chunks]
+    missing = sorted({fp: chunk.page_content for fp, chunk in zip(fingerprints, chunks) if fp not in cache}.items())
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        vectors = embedder.embed_documents([text for _, text in batch])
+        for (fp, _), vector in zip(batch, vectors):
+            cache[fp] = np.asarray(vector, dtype=np.float32)
+
+    vectors = np.stack([cache[fp] for fp in fingerprints]).astype(np.float32)
+    return fingerprints, vectors, len(missing)
+
+
+def write_atomically(index_path, write):
+    """`write(klasör)` ile geçici bir klasöre yazar, ardından klasörü tek adımda yerine koyar"""
+    index_path = os.path.normpath(index_path)
+    tmp_path = f"{index_path}.tmp-{os.getpid()}"
+    old_path = f"{index_path}.old-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        write(tmp_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    if os.path.exists(index_path):
+        os.rename(index_path, old_path)
+    os.rename(tmp_path, index_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def build_knowledge_base(name, config, embedder, chunk_size=800, chunk_overlap=100,
+                         workers=None, batch_size=128, full=False, index_spec=None):
+    index_path = config["index"]
+    if index_spec:
+        index_type, index_params = parse_index_spec(index_spec)
+    else:
+        index_type = config.get("index_type", "flat")
+        index_params = resolve_params(index_type, config.get("index_params"))
+    pdf_paths = resolve_pdfs(config["pdfs"])
+    missing_pdfs = [path for path in pdf_paths if not os.path.exists(path)]
+    if missing_pdfs:
+        raise FileNotFoundError(f"{name} için PDF bulunamadı: {missing_pdfs}")
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    pages = load_pages(pdf_paths, workers)
+    parse_seconds = time.perf_counter() - started
+
+    chunks = split_pages(pages, chunk_size, chunk_overlap)
+    cache = {} if full else load_embedding_cache(index_path, embedder_id(embedder))
+
+    started = time.perf_counter()
+    fingerprints, vectors, embedded = embed_chunks(chunks, cache, embedder, batch_size)
+    embed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = build_index(vectors, index_type, index_params)
+    index_seconds = time.perf_counter() - started
+
+    def write(path):
+        save_mmap_store(path, index, chunks)
+        save_embedding_cache(path, embedder_id(embedder), fingerprints, vectors)
+
+    write_atomically(index_path, write)
+
+    logger.info(
+        f"{name}: {len(pdf_paths)} PDF, {len(pages)} sayfa ({len(pages) / parse_seconds:.1f} sayfa/sn), "
+        f"{len(chunks)} parça, {embedded} parça yeniden embed edildi"
+        + (f" ({embedded / embed_seconds:.1f} parça/sn)" if embedded else "")
+        + f", {describe(index_type, effective_params(index, index_type, index_params))} index {index_seconds:.1f} sn -> {index_path}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bilgi tabanı FAISS index'lerini oluşturur")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--only", nargs="*", help="Yalnızca bu bilgi tabanlarını oluştur")
+    parser.add_argument("--workers", type=int, default=None, help="PDF çözme süreç sayısı")
+    parser.add_argument("--batch-size", type=int, default=128, help="Embedding batch boyutu")
+    parser.add_argument("--full", action="store_true", help="Embedding önbelleğini yok say, her şeyi yeniden embed et")
+    parser.add_argument("--index-type", help="Manifest'teki index türünü geçersiz kıl, örn. flat, hnsw:M=32, ivfpq:nlist=64")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    embedder = make_embedder(list(manifest["knowledge_bases"]), batch_size=args.batch_size)
+    for name, config in manifest["knowledge_bases"].items():
+        if args.only and name not in args.only:
+            continue
+        build_knowledge_base(
+            name,
+            config,
+            embedder,
+            chunk_size=manifest.get("chunk_size", 800),
+            chunk_overlap=manifest.get("chunk_overlap", 100),
+            workers=args.workers,
+            batch_size=args.batch_size,
+            full=args.full,
+            index_spec=args.index_type
+        )
+
+
+if __name__ == "__main__":
+    main()
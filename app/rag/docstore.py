@@ -0,0 +1,181 @@
+"""Pickle gerektirmeyen, bellek eşlemeli (mmap) doküman deposu.
+
+Bir index klasörü şu dosyalardan oluşur:
+    index.faiss        FAISS vektörleri (mmap ile okunur)
+    docstore.bin       UTF-8 parça metinleri ve JSON metadata'lar art arda
+    docstore.idx.npy   (N, 4) int64: metin ofseti, metin uzunluğu, metadata ofseti, metadata uzunluğu
+
+FAISS'teki i. vektör depodaki i. dokümana karşılık gelir. Dosyalar mmap ile
+açıldığından worker'lar aynı sayfaları işletim sisteminin önbelleğinden paylaşır
+ve açılış neredeyse anında olur.
+
+Eski `index.pkl` klasörlerini dönüştürmek için:
+    python -m app.rag.docstore app/rag/db app/rag/db2 --remove-pickle
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DATA_FILE = "docstore.bin"
+OFFSETS_FILE = "docstore.idx.npy"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+
+class ReadOnlyStoreError(ValueError):
+    """mmap ile açılmış bir bilgi tabanını değiştirme denemesi; index yeniden oluşturulmalıdır"""
+
+
+class MmapDocstore(Docstore):
+    """Dokümanları docstore.bin üzerinden, ihtiyaç anında ve kopyalamadan okur (salt okunur)"""
+
+    def __init__(self, path):
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        data_path = os.path.join(path, DATA_FILE)
+        with open(data_path, "rb") as f:
+            # Boş dosya mmap'lenemez
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(data_path) else b""
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def search(self, search):
+        try:
+            row = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= row < len(self.offsets):
+            return f"ID {search} not found."
+        text_start, text_length, meta_start, meta_length = (int(v) for v in self.offsets[row])
+        return Document(
+            page_content=self._data[text_start:text_start + text_length].decode("utf-8"),
+            metadata=json.loads(self._data[meta_start:meta_start + meta_length].decode("utf-8"))
+        )
+
+
+class RowIds(Mapping):
+    """FAISS satır numarasını doküman ID'sine eşleyen, bellek ayırmayan eşleme (i -> "i")"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise KeyError(row)
+        return str(row)
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
+
+
+def write_docstore(path, documents):
+    """Dokümanları FAISS satır sırasıyla docstore.bin / docstore.idx.npy olarak yazar"""
+    offsets = np.zeros((len(documents), 4), dtype=np.int64)
+    position = 0
+    with open(os.path.join(path, DATA_FILE), "wb") as f:
+        for row, document in enumerate(documents):
+            text = document.page_content.encode("utf-8")
+            meta = json.dumps(document.metadata, ensure_ascii=False).encode("utf-8")
+            f.write(text)
+            f.write(meta)
+            offsets[row] = (position, len(text), position + len(text), len(meta))
+            position += len(text) + len(meta)
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+
+
+def save_mmap_store(path, index, documents):
+    """FAISS index'ini ve satır sırasındaki dokümanları mmap formatında kaydeder"""
+    if index.ntotal != len(documents):
+        raise ValueError(f"index ({index.ntotal}) ve doküman sayısı ({len(documents)}) uyuşmuyor")
+    faiss.write_index(index, os.path.join(path, INDEX_FILE))
+    write_docstore(path, documents)
+
+
+def has_mmap_store(path):
+    return os.path.exists(os.path.join(path, OFFSETS_FILE))
+
+
+def read_index_mmap(index_path):
+    """FAISS index'ini mümkünse mmap ile, değilse normal şekilde okur"""
+    for flag in (getattr(faiss, "IO_FLAG_MMAP_IFC", None), faiss.IO_FLAG_MMAP):
+        if flag is None:
+            continue
+        try:
+            return faiss.read_index(index_path, flag)
+        except RuntimeError:
+            continue
+    return faiss.read_index(index_path)
+
+
+class ReadOnlyFAISS(FAISS):
+    """Yazma işlemlerini index'e dokunmadan reddeden vektör deposu.
+
+    mmap ile okunan index salt okunur sayfalara bağlıdır; FAISS.delete önce
+    index.remove_ids çağırdığından reddetme docstore'a bırakılamaz (süreç çöker).
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyStoreError("Bilgi tabanı salt okunur; değişiklik için index'i yeniden oluşturun")
+
+    add_texts = add_embeddings = add_documents = delete = merge_from = _read_only
+
+    async def aadd_texts(self, *args, **kwargs):
+        self._read_only()
+
+    async def aadd_documents(self, *args, **kwargs):
+        self._read_only()
+
+    async def adelete(self, *args, **kwargs):
+        self._read_only()
+
+
+def load_mmap_store(path, embeddings):
+    index = read_index_mmap(os.path.join(path, INDEX_FILE))
+    docstore = MmapDocstore(path)
+    if len(docstore) != index.ntotal:
+        raise ValueError(f"{path}: index ({index.ntotal}) ve doküman deposu ({len(docstore)}) uyuşmuyor")
+    return ReadOnlyFAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=RowIds(index.ntotal)
+    )
+
+
+def convert(path, remove_pickle=False):
+    """Eski index.pkl tabanlı klasörü mmap formatına dönüştürür"""
+    # Bu pickle'lar projenin kendi ürettiği dosyalardır; dönüştürme yalnızca bir kez yapılır
+    store = FAISS.load_local(path, embeddings=None, allow_dangerous_deserialization=True)
+    documents = [store.docstore.search(store.index_to_docstore_id[row]) for row in range(store.index.ntotal)]
+    write_docstore(path, documents)
+    if remove_pickle:
+        os.remove(os.path.join(path, LEGACY_DOCSTORE_FILE))
+    logger.info(f"{path}: {len(documents)} doküman mmap formatına dönüştürüldü")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="index.pkl klasörlerini mmap doküman deposuna dönüştürür")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--remove-pickle", action="store_true", help="Dönüştürmeden sonra index.pkl dosyasını sil")
+    args = parser.parse_args()
+    for path in args.paths:
+        convert(path, remove_pickle=args.remove_pickle)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Sorgu ve parça embedding'leri için seçilebilir arka uç.
+
+Varsayılan arka uç PyTorch fp32 SentenceTransformer'dır. Onaylı bir ONNX artifact'i
+(EMBEDDING_ARTIFACT) verilirse embedding'ler ONNX Runtime ile, sınırlı iş parçacığı
+sayısı ve batch'ler halinde hesaplanır.
+
+Örnek:
+    # fp32 ONNX veya INT8 quantize ONNX artifact üret
+    python -m app.rag.embeddings build --method onnx_int8 --output app/rag/models/minilm-int8
+
+    # Orijinal embedder ile manifest'teki tüm bilgi tabanlarında top-k örtüşmesini karşılaştır
+    python -m app.rag.embeddings compare --artifact app/rag/models/minilm-int8 --min-overlap 0.9
+
+Artifact klasörü model.onnx, embedding_config.json, tokenizer dosyaları ve
+karşılaştırma raporunu (parity.json) içerir. Raporu olmayan, eşiği geçemeyen ya da
+manifest'teki bilgi tabanlarından birini kapsamayan artifact yüklenmez.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from app.config import EMBEDDING_ARTIFACT, EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL_NAME, EMBEDDING_THREADS
+from app.inference.prediction_cache import checkpoint_version
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METHODS = ("onnx", "onnx_int8")
+MODEL_FILE = "model.onnx"
+PARITY_FILE = "parity.json"
+EMBEDDING_CONFIG_FILE = "embedding_config.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Dışa aktarılmış SentenceTransformer modelini ONNX Runtime ile çalıştırır"""
+
+    def __init__(self, artifact_path, num_threads=EMBEDDING_THREADS, batch_size=EMBEDDING_BATCH_SIZE):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(artifact_path, MODEL_FILE)
+        with open(os.path.join(artifact_path, EMBEDDING_CONFIG_FILE), encoding="utf-8") as f:
+            self.max_length = json.load(f)["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(artifact_path)
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.batch_size = batch_size
+        # Yalnızca build_knowledge_base'in kalıcı embedding_cache.npz'si bu kimlikle anahtarlanır;
+        # artifact değişince o önbellek geçersizleşir. Süreç içi sorgu önbellekleri (RetrievalCache,
+        # SemanticAnswerCache) soru metniyle anahtarlanır; süreç boyunca tek embedder kullanıldığı için yeterlidir.
+        self.model_id = f"{EMBEDDING_MODEL_NAME}@{checkpoint_version(model_path)}"
+
+    def _encode(self, texts):
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        input_ids = encoded["input_ids"]
+        inputs = {name: encoded.get(name, np.zeros_like(input_ids)).astype(np.int64) for name in self.input_names}
+        return self.session.run(None, inputs)[0]
+
+    def embed_documents(self, texts):
+        # Benzer uzunluktaki metinler aynı batch'e düşsün diye sıralanır; padding azalır
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+
+
+def export_onnx(model, output_path):
+    """Transformer + ortalama havuzlama (+ normalize) katmanlarını tek bir ONNX grafiğine aktarır"""
+    import torch
+    import torch.nn as nn
+    import torch.nn.functional as F
+    from sentence_transformers.models import Normalize, Pooling
+
+    # sentence-transformers sürümüne göre havuzlama modu tek alan ya da bayraklar olarak tutulur
+    config = next(module for module in model if isinstance(module, Pooling)).get_config_dict()
+    if "pooling_mode" in config:
+        modes = {config["pooling_mode"]}
+    else:
+        modes = {key for key, value in config.items() if key.startswith("pooling_mode_") and value is True}
+    if modes not in ({"mean"}, {"pooling_mode_mean_tokens"}):
+        raise SystemExit("Yalnızca ortalama havuzlama (mean pooling) kullanan modeller dışa aktarılabilir")
+    normalize = any(isinstance(module, Normalize) for module in model)
+    transformer = model[0].auto_model.eval()
+
+    class SentenceEncoder(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            hidden = self.transformer(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            ).last_hidden_state
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            return F.normalize(pooled, p=2, dim=1) if normalize else pooled
+
+    example = model.tokenizer(["örnek cümle"], padding=True, return_tensors="pt")
+    token_type_ids = example.get("token_type_ids", torch.zeros_like(example["input_ids"]))
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ("input_ids", "attention_mask", "token_type_ids")}
+    dynamic_axes["embedding"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEncoder().eval(),
+            (example["input_ids"], example["attention_mask"], token_type_ids),
+            output_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["embedding"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False
+        )
+
+
+def build_artifact(method, output_dir, model=None):
+    """Embedding modelini ONNX (isteğe bağlı INT8) olarak tokenizer'ıyla birlikte klasöre yazar"""
+    if method not in METHODS:
+        raise ValueError(f"Bilinmeyen yöntem: {method}")
+    model = model or load_sentence_transformer()
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, MODEL_FILE)
+
+    if method == "onnx":
+        export_onnx(model, model_path)
+    else:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        fp32_path = os.path.join(output_dir, "model_fp32.onnx")
+        export_onnx(model, fp32_path)
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+
+    model.tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, EMBEDDING_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model_name": EMBEDDING_MODEL_NAME, "method": method, "max_seq_length": model.max_seq_length}, f, indent=2)
+    logger.info(f"Embedding artifact'i kaydedildi: {output_dir} ({os.path.getsize(model_path) / 1e6:.1f} MB)")
+
+
+def sample_questions(store, limit):
+    """Bilgi tabanı parçalarının ilk cümlelerinden örnek sorgular üretir"""
+    step = max(1, store.index.ntotal // limit)
+    questions = []
+    for row in range(0, store.index.ntotal, step):
+        text = store.docstore.search(store.index_to_docstore_id[row]).page_content.strip()
+        if text:
+            questions.append(text.split(".")[0][:200])
+        if len(questions) >= limit:
+            break
+    return questions
+
+
+def _timed_embed(embedder, questions):
+    started = time.perf_counter()
+    vectors = np.asarray([embedder.embed_query(question) for question in questions], dtype=np.float32)
+    return vectors, time.perf_counter() - started
+
+
+def compare_knowledge_base(store, reference, candidate, questions, k):
+    """Tek bir bilgi tabanında iki embedder'ın sorgu vektörlerinin aynı top-k'yı bulup bulmadığını ölçer"""
+    # Isınma
+    _timed_embed(reference, questions[:2])
+    _timed_embed(candidate, questions[:2])
+
+    reference_vectors, reference_seconds = _timed_embed(reference, questions)
+    candidate_vectors, candidate_seconds = _timed_embed(candidate, questions)
+    _, reference_ids = store.index.search(reference_vectors, k)
+    _, candidate_ids = store.index.search(candidate_vectors, k)
+
+    overlaps = [len(set(r.tolist()) & set(c.tolist())) / k for r, c in zip(reference_ids, candidate_ids)]
+    cosines = np.sum(reference_vectors * candidate_vectors, axis=1) / (
+        np.linalg.norm(reference_vectors, axis=1) * np.linalg.norm(candidate_vectors, axis=1)
+    )
+    return {
+        "queries": len(questions),
+        "mean_top_k_overlap": float(np.mean(overlaps)),
+        "min_top_k_overlap": float(np.min(overlaps)),
+        "min_cosine": float(np.min(cosines)),
+        "reference_queries_per_sec": len(questions) / reference_seconds,
+        "optimized_queries_per_sec": len(questions) / candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds,
+    }
+
+
+def compare(artifact_path, names=None, questions=None, k=5, sample_limit=200, min_overlap=0.9, reference=None):
+    """Artifact'i orijinal embedder ile verilen (varsayılan: manifest'teki tüm) bilgi tabanlarında karşılaştırır.
+
+    Artifact tüm bilgi tabanları ve anlamsal önbellek için ortak kullanıldığından
+    yalnızca her bilgi tabanında eşiği geçerse onaylanır.
+    """
+    from app.rag.retriever_registry import knowledge_bases
+
+    names = names or knowledge_bases.names()
+    reference = reference or SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    candidate = OnnxEmbeddings(artifact_path)
+
+    results = {}
+    for name in names:
+        store = knowledge_bases.get(name)
+        result = compare_knowledge_base(
+            store, reference, candidate, questions or sample_questions(store, sample_limit), k
+        )
+        result["approved"] = result["mean_top_k_overlap"] >= min_overlap
+        results[name] = result
+        logger.info(f"{name}: ortalama top-{k} örtüşme {result['mean_top_k_overlap']:.3f}")
+
+    report = {
+        "artifact_version": checkpoint_version(os.path.join(artifact_path, MODEL_FILE)),
+        "k": k,
+        "min_overlap": min_overlap,
+        "knowledge_bases": results,
+        "approved": all(result["approved"] for result in results.values()),
+    }
+    with open(os.path.join(artifact_path, PARITY_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def is_approved(artifact_path, names):
+    """Artifact'in bu model sürümü için verilen tüm bilgi tabanlarında başarılı bir karşılaştırma raporu var mı"""
+    try:
+        with open(os.path.join(artifact_path, PARITY_FILE), encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if report.get("artifact_version") != checkpoint_version(os.path.join(artifact_path, MODEL_FILE)):
+        return False
+    checked = report.get("knowledge_bases", {})
+    missing = sorted(set(names) - set(checked))
+    if missing:
+        logger.warning(f"{artifact_path} şu bilgi tabanlarında karşılaştırılmamış: {missing}")
+        return False
+    return all(checked[name].get("approved") for name in names)
+
+
+def make_embedder(knowledge_bases, batch_size=EMBEDDING_BATCH_SIZE, artifact_path=EMBEDDING_ARTIFACT):
+    """Onaylı bir ONNX artifact varsa onu, yoksa PyTorch SentenceTransformer embedder'ını döner.
+
+    `knowledge_bases`, embedder'ın kullanılacağı bilgi tabanı adlarıdır; artifact hepsinde onaylı olmalıdır.
+    """
+    if artifact_path:
+        if not is_approved(artifact_path, knowledge_bases):
+            logger.warning(f"{artifact_path} onaylı bir karşılaştırma raporuna sahip değil, PyTorch embedder kullanılacak")
+        else:
+            try:
+                embedder = OnnxEmbeddings(artifact_path, batch_size=batch_size)
+                logger.info(f"ONNX embedding modeli yüklendi: {artifact_path}")
+                return embedder
+            except ImportError as e:
+                logger.warning(f"ONNX embedding modeli yüklenemedi ({e}), PyTorch embedder kullanılacak")
+    return SentenceTransformerEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        encode_kwargs={"batch_size": batch_size}
+    )
+
+
+def embedder_id(embedder):
+    """Kalıcı embedding önbelleğinde (embedding_cache.npz) kullanılan model kimliği"""
+    return getattr(embedder, "model_id", EMBEDDING_MODEL_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize embedding modelleri üretir ve doğrular")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="ONNX embedding artifact'i üretir")
+    build_parser.add_argument("--method", required=True, choices=METHODS)
+    build_parser.add_argument("--output", required=True, help="Artifact klasörü")
+
+    compare_parser = subparsers.add_parser("compare", help="Artifact'i orijinal embedder ile karşılaştırır")
+    compare_parser.add_argument("--artifact", required=True)
+    compare_parser.add_argument("--kb", nargs="*", help="Karşılaştırılacak bilgi tabanları (varsayılan: manifest'teki tümü)")
+    compare_parser.add_argument("--questions", help="Her satırda bir soru içeren dosya (verilmezse parçalardan örneklenir)")
+    compare_parser.add_argument("--k", type=int, default=5)
+    compare_parser.add_argument("--sample-limit", type=int, default=200)
+    compare_parser.add_argument("--min-overlap", type=float, default=0.9)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_artifact(args.method, args.output)
+    else:
+        questions = None
+        if args.questions:
+            with open(args.questions, encoding="utf-8") as f:
+                questions = [line.strip() for line in f if line.strip()]
+        report = compare(
+            args.artifact,
+            args.kb,
+            questions=questions,
+            k=args.k,
+            sample_limit=args.sample_limit,
+            min_overlap=args.min_overlap
+        )
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if not report["approved"]:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
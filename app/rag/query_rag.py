@@ -1,42 +1,134 @@
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain.chains.question_answering import load_qa_chain
-from langchain_google_genai import ChatGoogleGenerativeAI
-
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.agents.llm_clients import get_qa_chain
+from app.rag.retrieval_cache import retrieval_cache, normalize_question
+from app.rag.retriever_registry import knowledge_bases, get_embedder
 
 load_dotenv()
 
+
+def embed_question(question, normalized_question=None):
+    """Sorgu vektörünü önbellekten döner, yoksa embedding modeliyle hesaplar.
+
+    Normalize metin yalnızca önbellek anahtarıdır; embedding orijinal sorudan hesaplanır.
+    """
+    normalized_question = normalized_question or normalize_question(question)
+    vector = retrieval_cache.get_vector(normalized_question)
+    if vector is None:
+        vector = np.asarray(get_embedder().embed_query(question), dtype=np.float32)
+        retrieval_cache.put_vector(normalized_question, vector)
+    return vector
+
+
+def search_ids(store, vector, k):
+    """FAISS index'inde arama yapar, (doküman ID'si, uzaklık) çiftlerini döner"""
+    distances, indices = store.index.search(vector.reshape(1, -1), k)
+    return [
+        (store.index_to_docstore_id[i], float(distance))
+        for i, distance in zip(indices[0], distances[0]) if i != -1
+    ]
+
+
+def search_knowledge_base(name, question, k, vector=None):
+    """Tek bir bilgi tabanında arar; (vektör deposu, [(doküman ID'si, uzaklık)]) döner"""
+    normalized_question = normalize_question(question)
+    store, generation = knowledge_bases.snapshot(name)
+    hits = retrieval_cache.get_ids(name, generation, normalized_question, k)
+    if hits is None:
+        if vector is None:
+            vector = embed_question(question, normalized_question)
+        hits = search_ids(store, vector, k)
+        retrieval_cache.put_ids(name, generation, normalized_question, k, hits)
+    return store, hits
+
+
+def retrieve_documents(name: str, question: str, k: int = 2):
+    """Bilgi tabanından soruya en yakın k dokümanı getirir"""
+    store, hits = search_knowledge_base(name, question, k)
+    return [store.docstore.search(doc_id) for doc_id, _ in hits]
+
+
+# FAISS araması GIL'i bıraktığından bilgi tabanları iş parçacıklarında paralel aranır
+search_pool = ThreadPoolExecutor(max_workers=max(1, len(knowledge_bases.names())), thread_name_prefix="rag-search")
+
+
+def retrieve_from_all(question: str, k: int = 4, names=None):
+    """Soruyu bir kez embed edip tüm bilgi tabanlarında eşzamanlı arar.
+
+    Tüm index'ler aynı embedding modeli ve L2 uzaklığını kullandığından sonuçlar
+    uzaklığa göre birleştirilir ve en yakın k doküman döner. Her dokümanın
+    metadata'sına geldiği bilgi tabanı `knowledge_base` olarak eklenir.
+    """
+    names = names or knowledge_bases.names()
+    vector = embed_question(question)
+    futures = {
+        name: search_pool.submit(search_knowledge_base, name, question, k, vector)
+        for name in names
+    }
+
+    ranked = []
+    for name, future in futures.items():
+        store, hits = future.result()
+        ranked.extend((distance, name, store, doc_id) for doc_id, distance in hits)
+    ranked.sort(key=lambda hit: hit[0])
+
+    documents = []
+    for _, name, store, doc_id in ranked[:k]:
+        doc = store.docstore.search(doc_id)
+        documents.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "knowledge_base": name}))
+    return documents
+
+
 def ask_with_context_lung(question: str):
-    db = FAISS.load_local(
-        "app/rag/db",
-        embeddings=SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2"),
-        allow_dangerous_deserialization=True
-    )
-    docs = db.similarity_search(question, k=2)
-
-    llm = ChatGoogleGenerativeAI(temperature=0.3)
-    chain = load_qa_chain(llm, chain_type="stuff")
+    docs = retrieve_documents("lung", question, k=2)
+
+    chain = get_qa_chain("rag")
     answer = chain.run(input_documents=docs, question=question)
 
     return answer
 
 def ask_with_context_brain(question: str):
-    db = FAISS.load_local(
-        "app/rag/db2",
-        embeddings=SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2"),
-        allow_dangerous_deserialization=True
-    )
-    docs = db.similarity_search(question, k=2)
-
-    llm = ChatGoogleGenerativeAI(temperature=0.3)
-    chain = load_qa_chain(llm, chain_type="stuff")
+    docs = retrieve_documents("brain", question, k=2)
+
+    chain = get_qa_chain("rag")
+    answer = chain.run(input_documents=docs, question=question)
+
+    return answer
+
+def ask_with_context_all(question: str, k: int = 4):
+    """Birden fazla organı ilgilendiren sorular için tüm bilgi tabanlarından tek yanıt üretir"""
+    docs = retrieve_from_all(question, k=k)
+
+    chain = get_qa_chain("rag")
     answer = chain.run(input_documents=docs, question=question)
 
     return answer
 
 
+# Async sürümler: gömme ve FAISS araması CPU'da iş parçacığında, LLM çağrısı olay döngüsünde bekler
+async def aanswer_from_documents(docs, question: str):
+    chain = get_qa_chain("rag")
+    return await chain.arun(input_documents=docs, question=question)
+
+async def aask_with_context_lung(question: str):
+    docs = await asyncio.to_thread(retrieve_documents, "lung", question, 2)
+    return await aanswer_from_documents(docs, question)
+
+async def aask_with_context_brain(question: str):
+    docs = await asyncio.to_thread(retrieve_documents, "brain", question, 2)
+    return await aanswer_from_documents(docs, question)
+
+async def aask_with_context_all(question: str, k: int = 4):
+    docs = await asyncio.to_thread(retrieve_from_all, question, k)
+    return await aanswer_from_documents(docs, question)
+
+
 if __name__ == "__main__":
     q = "beyin hastalıklarını açıkla "
     print("Cevap:", ask_with_context_brain(q))
@@ -0,0 +1,95 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import RAG_CACHE_SIZE, RAG_CACHE_TTL_SECONDS
+
+
+def normalize_question(question):
+    """Soruyu önbellek anahtarı için normalize eder (Türkçe küçük harf, boşluk ve son noktalama)"""
+    text = question.replace("I", "ı").replace("İ", "i").lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.… ").strip()
+
+
+class TTLCache:
+    """Süre sınırlı (TTL) LRU önbellek; isabet oranını da tutar"""
+
+    def __init__(self, capacity, ttl_seconds):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class RetrievalCache:
+    """Sorgu vektörlerini ve bilgi tabanı başına top-k doküman ID'lerini (uzaklıklarıyla) önbellekler.
+
+    Vektörler tüm bilgi tabanlarında ortak embedding modeliyle üretildiğinden yalnızca
+    normalize soruyla anahtarlanır. Doküman ID'leri index neslini de anahtarda taşır;
+    index yeniden oluşturulup yüklendiğinde eski sonuçlar kendiliğinden geçersizleşir.
+    """
+
+    def __init__(self, capacity=RAG_CACHE_SIZE, ttl_seconds=RAG_CACHE_TTL_SECONDS):
+        self.vectors = TTLCache(capacity, ttl_seconds)
+        self.results = TTLCache(capacity, ttl_seconds)
+
+    def get_vector(self, normalized_question):
+        return self.vectors.get(normalized_question)
+
+    def put_vector(self, normalized_question, vector):
+        self.vectors.put(normalized_question, vector)
+
+    def get_ids(self, name, generation, normalized_question, k):
+        return self.results.get((name, generation, normalized_question, k))
+
+    def put_ids(self, name, generation, normalized_question, k, doc_ids):
+        self.results.put((name, generation, normalized_question, k), doc_ids)
+
+    def stats(self):
+        return {"query_vectors": self.vectors.stats(), "top_k_results": self.results.stats()}
+
+
+retrieval_cache = RetrievalCache()
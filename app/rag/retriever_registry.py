@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from langchain_community.vectorstores import FAISS
+
+from app.config import RAG_RELOAD_CHECK_SECONDS
+from app.rag.ann_index import apply_search_params
+from app.rag.docstore import has_mmap_store, load_mmap_store
+from app.rag.embeddings import embedder_id, make_embedder
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = "app/rag/knowledge_bases.json"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Bilgi tabanı adlarını, index klasörlerini ve kaynak PDF'leri tanımlayan manifest'i okur"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_manifest = load_manifest()
+KNOWLEDGE_BASES = {
+    name: config["index"] for name, config in _manifest["knowledge_bases"].items()
+}
+# HNSW için efSearch, IVF-PQ için nprobe; index dosyasındaki değerleri geçersiz kılar
+SEARCH_PARAMS = {
+    name: config.get("search_params", {}) for name, config in _manifest["knowledge_bases"].items()
+}
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """Tüm bilgi tabanlarının paylaştığı sorgu embedding modelini döner"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                started = time.perf_counter()
+                _embedder = make_embedder(list(KNOWLEDGE_BASES))
+                logger.info(f"Embedding modeli yüklendi ({time.perf_counter() - started:.1f} sn)")
+    return _embedder
+
+
+def index_signature(path):
+    """Klasördeki dosyaların ad, boyut ve değişiklik zamanından bir imza üretir"""
+    try:
+        return tuple(sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(path) if entry.is_file()
+        ))
+    except FileNotFoundError:
+        return ()
+
+
+class _LoadedIndex:
+    def __init__(self, store, signature, generation):
+        self.store = store
+        self.signature = signature
+        self.generation = generation
+        self.checked_at = time.monotonic()
+
+
+class RetrieverRegistry:
+    """Her FAISS bilgi tabanını süreç başına bir kez yükler.
+
+    Diskteki index dosyaları değiştiğinde (en fazla `check_interval` saniyede bir
+    kontrol edilir) index yeniden yüklenip tek adımda değiştirilir;
+    her yeniden yüklemede `generation` artar.
+    """
+
+    def __init__(self, paths, check_interval=RAG_RELOAD_CHECK_SECONDS, search_params=None):
+        self.paths = dict(paths)
+        self.search_params = dict(search_params or {})
+        self.check_interval = check_interval
+        self._loaded = {}
+        self._locks = {name: threading.Lock() for name in self.paths}
+        self.reloads = 0
+
+    def names(self):
+        return list(self.paths)
+
+    def get(self, name):
+        """Bilgi tabanının güncel vektör deposunu döner"""
+        return self._entry(name).store
+
+    def generation(self, name):
+        return self._entry(name).generation
+
+    def snapshot(self, name):
+        """Vektör deposunu ve ona ait nesil numarasını birlikte döner"""
+        entry = self._entry(name)
+        return entry.store, entry.generation
+
+    def _entry(self, name):
+        entry = self._loaded.get(name)
+        if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+            return entry
+
+        with self._locks[name]:
+            entry = self._loaded.get(name)
+            signature = index_signature(self.paths[name])
+            if entry is not None and entry.signature == signature:
+                entry.checked_at = time.monotonic()
+                return entry
+
+            generation = entry.generation + 1 if entry is not None else 1
+            try:
+                store = self._load(name)
+            except Exception as e:
+                if entry is None:
+                    raise
+                # Index yeniden yazılırken yakalanmış olabilir; eski index'le devam edilir
+                logger.warning(f"{name} bilgi tabanı yeniden yüklenemedi, eski index kullanılıyor: {e}")
+                entry.checked_at = time.monotonic()
+                return entry
+            entry = _LoadedIndex(store, signature, generation)
+            self._loaded[name] = entry
+            if generation > 1:
+                self.reloads += 1
+                logger.info(f"{name} bilgi tabanı diskte değişti, yeniden yüklendi (nesil {generation})")
+            return entry
+
+    def _load(self, name):
+        started = time.perf_counter()
+        path = self.paths[name]
+        if has_mmap_store(path):
+            store = load_mmap_store(path, get_embedder())
+        else:
+            # Henüz dönüştürülmemiş eski index.pkl klasörleri
+            logger.warning(f"{name} bilgi tabanı eski pickle formatında; 'python -m app.rag.docstore {path}' ile dönüştürün")
+            store = FAISS.load_local(path, embeddings=get_embedder(), allow_dangerous_deserialization=True)
+        apply_search_params(store.index, self.search_params.get(name))
+        logger.info(
+            f"{name} bilgi tabanı yüklendi - {type(store.index).__name__}, {store.index.ntotal} vektör, "
+            f"{time.perf_counter() - started:.2f} sn"
+        )
+        return store
+
+    def warmup(self, names=None, background=False):
+        """Embedding modelini ve bilgi tabanlarını önceden yükler"""
+        def run():
+            for name in names or self.names():
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"{name} bilgi tabanı yüklenemedi: {e}")
+
+        if background:
+            threading.Thread(target=run, name="rag-warmup", daemon=True).start()
+        else:
+            run()
+
+    def stats(self):
+        return {
+            "embedder": embedder_id(_embedder) if _embedder is not None else None,
+            "reloads": self.reloads,
+            "knowledge_bases": {
+                name: {
+                    "loaded": name in self._loaded,
+                    "generation": self._loaded[name].generation if name in self._loaded else 0,
+                    "vectors": self._loaded[name].store.index.ntotal if name in self._loaded else 0,
+                    "index_type": type(self._loaded[name].store.index).__name__ if name in self._loaded else None,
+                }
+                for name in self.paths
+            },
+        }
+
+
+knowledge_bases = RetrieverRegistry(KNOWLEDGE_BASES, search_params=SEARCH_PARAMS)